@@ -1,30 +1,12 @@
-import pandas as pd
-import re
+import sys
+from pathlib import Path
 
-# Load the latest and old COA Excel files
-latest_df = pd.read_excel("Assets_COA.xlsx")
-old_df = pd.read_excel("Assets_GL.xlsx")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # shared helpers at the repo root
+from reconcile import reconcile_files
 
-# --- Clean and extract 10-digit codes from latest COA ---
-# Convert all to string and extract 10-digit codes
-latest_df = latest_df.astype(str)
-latest_df["Code"] = latest_df.iloc[:, 0].str.extract(r"(\b\d{10}\b)")
-latest_df["description"] = latest_df.iloc[:, 0].str.extract(r"\b\d{10}\b\s+(.*)")
-
-# Drop rows without valid code
-latest_df = latest_df.dropna(subset=["Code"])
-
-# --- Clean codes from old COA ---
-old_df = old_df.dropna(subset=["Code"])
-old_df["Code"] = old_df["Code"].astype(float).astype(int).astype(str).str.zfill(10)
-
-# --- Compare and find missing codes ---
-latest_codes = set(latest_df["Code"])
-old_codes = set(old_df["Code"])
-missing_codes = sorted(latest_codes - old_codes)
-
-# --- Filter the missing entries from latest_df ---
-missing_df = latest_df[latest_df["Code"].isin(missing_codes)]
+# Latest COA codes that are missing from the GL export, compared as 10-digit codes
+# (python reconcile.py at the repo root checks both directions for every category)
+missing_df, _ = reconcile_files("Assets_COA.xlsx", "Assets_GL.xlsx")
 
 # --- Export the result ---
 missing_df.to_excel("missing_liability_accounts.xlsx", index=False)
@@ -1,22 +1,16 @@
-import pandas as pd
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # shared helpers at the repo root
+from reconcile import reconcile_files
 
 # Load the Excel files
 file1_path = 'Expense_coa.xlsx'
 file2_path = 'Expense_gl.xlsx'
 
-# Read the sheets (assumes data is in the first sheet of each file)
-df1 = pd.read_excel(file1_path)
-df2 = pd.read_excel(file2_path)
-
-# Ensure 'Code' columns are treated as strings to preserve formatting
-df1['Code'] = df1['Code'].astype(str)
-df2['Code'] = df2['Code'].astype(str)
-
-# Find codes in df1 but not in df2
-missing_in_gl = df1[~df1['Code'].isin(df2['Code'])]
-
-# Find codes in df2 but not in df1
-missing_in_coa = df2[~df2['Code'].isin(df1['Code'])]
+# Codes in the COA but not in the GL, and the other way round, compared as 10-digit codes
+# (python reconcile.py at the repo root checks every category into one workbook)
+missing_in_gl, missing_in_coa = reconcile_files(file1_path, file2_path)
 
 # Save the results to Excel files
 missing_in_gl.to_excel('missing_in_gl.xlsx', index=False)
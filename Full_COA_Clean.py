@@ -1,19 +1,14 @@
-import pandas as pd
-import re
+from coatext import read_code_lines, report_unmatched
 
 # Load the Excel file (replace with your file path)
 file_path = "4.xlsx"
-df = pd.read_excel(file_path, header=None)
+unmatched_file = "Structured_COA_unmatched.xlsx"  # lines without a 10-digit account code
 
-# Flatten to a single-column Series and drop NaNs
-rows = df[0].dropna().astype(str)
+# Stream the first column and split each line into its 10-digit account code and description
+structured_df, unmatched = read_code_lines(file_path)
 
-# Extract only rows with a 10-digit account code followed by a description
-pattern = r"^(?P<code>\d{10})\s+(?P<description>.+)$"
-structured_df = rows.str.extract(pattern)
-
-# Drop rows where code is not matched (invalid format)
-structured_df = structured_df.dropna(subset=["code"])
+# Lines that are not "<code> <description>" are left out and listed separately
+report_unmatched(unmatched, unmatched_file)
 
 # Optionally: Export to a new Excel file
 structured_df.to_excel("Structured_COA.xlsx", index=False)
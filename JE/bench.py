@@ -0,0 +1,175 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from journal import AnalyticResolver, balance_exceptions, build_journal_frame, prepare_gl
+
+try:
+    import resource  # not available on Windows
+except ImportError:
+    resource = None
+
+# -------------------------------
+# Settings
+# -------------------------------
+SIZES = [10_000, 100_000, 1_000_000, 5_000_000]  # GL lines per run
+SEED = 2025
+RESULTS_FILE = "bench_results.csv"
+
+COMPANIES = ["KE10", "KE20", "KE30", "UG10", "UG20", "TZ10", "MU10", "RW10", "ZA10", "NG10", "IN10", "GB10"]
+CURRENCIES = ["UGX", "KES", "TZS", "USD", "EUR", "MUR", "ZAR", "NGN", "INR", "GBP"]
+DOC_TYPES = ["SA", "AB", "KR", "KZ", "DR", "DZ", "ZP"]
+ANALYTIC_TOKENS = 5_000  # size of the synthetic analytic account list
+COMBINATIONS = 3_000     # distinct (profit center, cost center, WBS) triples, as in the real extracts
+
+
+def synthetic_analytic_map(seed: int = SEED) -> dict:
+    rng = np.random.default_rng(seed)
+    companies = rng.choice(COMPANIES, size=ANALYTIC_TOKENS)
+    kinds = rng.choice(list("ABCW"), size=ANALYTIC_TOKENS)
+    return {f"{co}{kind}{i:06d}": str(10_000 + i) for i, (co, kind) in enumerate(zip(companies, kinds))}
+
+
+def synthetic_gl(lines: int, analytic_map: dict, seed: int = SEED) -> pd.DataFrame:
+    """
+    GL extract with the same columns and value shapes as "GL Extract Jan to July 2025.XLSX":
+    balanced documents of 2-12 lines, mixed companies and currencies, sparse analytic fields
+    (some comma-separated, some unmapped) and blank Text / Vendor Name cells.
+    """
+    rng = np.random.default_rng(seed)
+
+    # documents: sizes 2..12, trimmed to the requested line count
+    sizes = rng.integers(2, 13, size=lines // 2 + 1)
+    cum = np.cumsum(sizes)
+    k = np.searchsorted(cum, lines)
+    sizes = sizes[: k + 1]
+    sizes[-1] -= cum[k] - lines
+    docs = len(sizes)
+    doc_idx = np.repeat(np.arange(docs), sizes)
+    first = np.r_[True, doc_idx[1:] != doc_idx[:-1]]
+
+    # balanced local amounts: the last line of each document offsets the others
+    local = rng.integers(-5_000_000, 5_000_000, size=lines)
+    last = np.r_[doc_idx[1:] != doc_idx[:-1], True]
+    sums = np.bincount(doc_idx, weights=np.where(last, 0, local)).astype(np.int64)
+    local[last] = -sums
+    rate = rng.choice([1.0, 1.0, 3700.0, 129.0, 2500.0], size=docs)[doc_idx]
+    amount_doc = np.round(local / rate, 2)
+
+    doc_number = 3_400_000_000 + rng.permutation(docs * 3)[:docs]
+    company = rng.choice(COMPANIES, size=docs)[doc_idx]
+    currency = rng.choice(CURRENCIES, size=docs)[doc_idx]
+    doc_date = (pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 365, size=docs), unit="D"))
+    doc_date = doc_date.to_numpy()[doc_idx]
+
+    tokens = np.array(list(analytic_map) + [f"UNMAPPED{i:04d}" for i in range(50)], dtype=object)
+
+    def sparse_tokens(fill: float, multi: float) -> np.ndarray:
+        out = np.full(COMBINATIONS, np.nan, dtype=object)
+        has = rng.random(COMBINATIONS) < fill
+        out[has] = tokens[rng.integers(0, len(tokens), size=has.sum())]
+        two = has & (rng.random(COMBINATIONS) < multi)
+        out[two] = out[two] + ", " + tokens[rng.integers(0, len(tokens), size=two.sum())]
+        return out
+
+    combo = rng.integers(0, COMBINATIONS, size=lines)
+
+    vendors = np.array([f"VENDOR {i:05d} LTD" for i in range(2_000)], dtype=object)
+    vendor = np.full(lines, np.nan, dtype=object)
+    has_vendor = rng.random(lines) < 0.4
+    vendor[has_vendor] = vendors[rng.integers(0, len(vendors), size=has_vendor.sum())]
+
+    texts = np.array(["Refund", "Petty cash", "Accrual reversal", "Bank charges", "Salary advance"], dtype=object)
+    text = np.full(lines, np.nan, dtype=object)
+    has_text = rng.random(lines) < 0.6
+    text[has_text] = texts[rng.integers(0, len(texts), size=has_text.sum())]
+
+    account = rng.integers(1_000_000_000, 9_999_999_999, size=800).astype(float)
+    nan = np.full(lines, np.nan)
+
+    return pd.DataFrame({
+        "Account": rng.choice(account, size=lines),
+        "G/L Acct Long Text": "Synthetic GL account",
+        "Entry Date": doc_date,
+        "Company Code": company,
+        "Cleared/open items symbol": nan,
+        "Assignment": np.char.mod("%d", rng.integers(4_400_000_000, 4_400_009_999, size=lines)).astype(object),
+        "Document Number": doc_number[doc_idx].astype(float),
+        "Amount in doc. curr.": amount_doc,
+        "Document currency": currency,
+        "Amt in Grp. Curr.": amount_doc,
+        "User name": "SYNTH",
+        "Doc.status": nan,
+        "Business Area": nan,
+        "Document Type": rng.choice(DOC_TYPES, size=docs)[doc_idx],
+        "Posting Date": doc_date,
+        "Document Date": doc_date,
+        "Posting Key": np.where(local > 0, 40.0, 50.0),
+        "Amount in local currency": local,
+        "Local Currency": currency,
+        "Cost Center": sparse_tokens(0.3, 0.05)[combo],
+        "Name": "Synthetic",
+        "Name of offsetting account": np.where(first, "Offset account", "Clearing").astype(object),
+        "Purchasing Document": nan,
+        "Reference": np.nan,
+        "Vendor Name": vendor,
+        "WBS element": sparse_tokens(0.1, 0.02)[combo],
+        "Tax code": np.nan,
+        "Clearing Document": nan,
+        "Profit Center": sparse_tokens(0.8, 0.1)[combo],
+        "Text": text,
+        "Offsett.account type": rng.choice(["S", "K", "D"], size=lines),
+        "Offsetting acct no.": np.char.mod("%d", rng.integers(2_000_000_000, 2_999_999_999, size=lines)).astype(object),
+    })
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / 1024, 1)  # Linux reports kilobytes
+
+
+def run_size(lines: int) -> dict:
+    """Generate one extract and time the transform; runs in a fresh process so peak RSS is per size."""
+    analytic_map = synthetic_analytic_map()
+    gl_df = synthetic_gl(lines, analytic_map)
+    input_mb = gl_df.memory_usage(deep=True).sum() / 2**20
+
+    start = time.perf_counter()
+    resolver = AnalyticResolver(analytic_map)
+    out = build_journal_frame(prepare_gl(gl_df), resolver)
+    unbalanced = balance_exceptions(out)
+    wall = time.perf_counter() - start
+
+    return {
+        "lines": lines,
+        "documents": int(out["Journal"].ne("").sum()),
+        "wall_s": round(wall, 3),
+        "lines_per_s": int(lines / wall) if wall else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "input_mb": round(input_mb, 1),
+        "unbalanced": len(unbalanced),
+        "unmapped_tokens": len(resolver.unmapped),
+    }
+
+
+def main():
+    results = []
+    for lines in SIZES:
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            res = pool.submit(run_size, lines).result()
+        results.append(res)
+        print(
+            f"{res['lines']:>10,} lines  {res['wall_s']:>8.2f}s  {res['lines_per_s']:>10,} lines/s  "
+            f"peak RSS {res['peak_rss_mb'] or 'n/a'} MB"
+        )
+
+    pd.DataFrame(results).to_csv(RESULTS_FILE, index=False)
+    print(f"✅ Benchmark saved to '{RESULTS_FILE}'")
+
+
+if __name__ == "__main__":
+    main()
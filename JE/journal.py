@@ -0,0 +1,510 @@
+import hashlib
+import json
+import operator
+import os
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from pandas.api.types import is_bool_dtype, is_numeric_dtype
+from pandas.io.parsers import TextParser
+
+# -------------------------------
+# Odoo journal import layout
+# -------------------------------
+JOURNAL_NAME = "Miscellaneous Operations"
+STATUS = "Draft"
+DEFAULT_CURRENCY = "UGX"
+ANALYTIC_COLS = ["Profit Center", "Cost Center", "WBS element"]
+
+OUTPUT_COLUMNS = [
+    "Reference",
+    "Company",
+    "Date",
+    "Journal",
+    "Number",
+    "Status",
+    "Total Signed",
+    "Journal Items/Account",
+    "Journal Items/Label",
+    "Journal Items/Amount in Currency",
+    "Journal Items/Partner",
+    "Journal Items/Currency",
+    "Journal Items/Debit",
+    "Journal Items/Credit",
+    "Journal Items/Analytic Distribution",
+]
+
+
+def clean_number(val):
+    try:
+        return str(int(float(val)))
+    except (ValueError, TypeError):
+        return ""
+
+
+def clean_number_column(s: pd.Series) -> pd.Series:
+    """Column version of clean_number: 3400000004.0 -> '3400000004', junk -> ''."""
+    num = pd.to_numeric(s, errors="coerce")
+    ok = np.isfinite(num.to_numpy(dtype="float64", na_value=np.nan))
+    out = pd.Series("", index=s.index, dtype=object)
+    out[ok] = np.trunc(num[ok]).astype("int64").astype(str)
+    return out
+
+
+def load_analytic_map(map_df: pd.DataFrame) -> dict:
+    return dict(zip(map_df["Analytic Account"].astype(str), map_df["ID"].astype(str)))
+
+
+def prepare_gl(gl_df: pd.DataFrame) -> pd.DataFrame:
+    """Normalize document numbers and amounts the same way for every builder."""
+    gl_df = gl_df.copy()
+    gl_df["Document Number"] = clean_number_column(gl_df["Document Number"])
+    gl_df["Amount in doc. curr."] = pd.to_numeric(gl_df["Amount in doc. curr."], errors="coerce").fillna(0)
+    gl_df["Amount in local currency"] = pd.to_numeric(gl_df["Amount in local currency"], errors="coerce").fillna(0)
+    return gl_df
+
+
+def analytic_json(values, analytic_map: dict) -> str:
+    """Build the Odoo analytic distribution for one line from its (profit center, cost center, WBS) values."""
+    analytic_dict = {}
+    for val in values:
+        if pd.notna(val) and str(val).strip() != "":
+            for entry in str(val).split(","):
+                entry = entry.strip()
+                if entry in analytic_map:
+                    analytic_dict[analytic_map[entry]] = 100.0
+    return json.dumps(analytic_dict) if analytic_dict else ""
+
+
+def _col(df: pd.DataFrame, name: str, default) -> pd.Series:
+    if name in df.columns:
+        return df[name]
+    return pd.Series(default, index=df.index, dtype=object)
+
+
+class AnalyticResolver:
+    """
+    Resolves (profit center, cost center, WBS) triples to the analytic distribution JSON.
+
+    Each distinct triple is split, looked up and serialized once; results are kept in a
+    bounded LRU cache so repeated combinations across batches cost a dict lookup. Tokens
+    missing from the mapping are counted (by GL line) in the same pass.
+    """
+
+    def __init__(self, analytic_map: dict, max_entries: int = 100_000):
+        self.analytic_map = analytic_map
+        self.max_entries = max_entries
+        self.unmapped = Counter()
+        self._cache = OrderedDict()
+
+    def resolve(self, triple: tuple):
+        """Return (json, unmapped tokens) for one triple of cleaned strings."""
+        hit = self._cache.get(triple)
+        if hit is not None:
+            self._cache.move_to_end(triple)
+            return hit
+
+        analytic_dict = {}
+        missing = []
+        for val in triple:
+            if val.strip() == "":
+                continue
+            for entry in val.split(","):
+                entry = entry.strip()
+                if entry in self.analytic_map:
+                    analytic_dict[self.analytic_map[entry]] = 100.0
+                elif entry:
+                    missing.append(entry)
+
+        hit = (json.dumps(analytic_dict) if analytic_dict else "", tuple(missing))
+        self._cache[triple] = hit
+        if len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return hit
+
+    def resolve_column(self, df: pd.DataFrame) -> pd.Series:
+        """Analytic distribution for every line of df, computed once per distinct triple."""
+        parts = [_col(df, c, "").fillna("").astype(str) for c in ANALYTIC_COLS]
+        key = parts[0].str.cat(parts[1:], sep="\x1f")
+        codes, uniques = pd.factorize(key)
+        line_counts = np.bincount(codes, minlength=len(uniques)) if len(codes) else []
+
+        resolved = np.empty(len(uniques), dtype=object)
+        for i, u in enumerate(uniques):
+            resolved[i], missing = self.resolve(tuple(u.split("\x1f")))
+            for token in missing:
+                self.unmapped[token] += int(line_counts[i])
+        return pd.Series(resolved[codes], index=df.index, dtype=object)
+
+    def unmapped_report(self) -> pd.DataFrame:
+        return pd.DataFrame(
+            sorted(self.unmapped.items(), key=lambda kv: (-kv[1], kv[0])),
+            columns=["Analytic Account", "Lines"],
+        )
+
+
+def _as_resolver(analytic_map) -> AnalyticResolver:
+    if isinstance(analytic_map, AnalyticResolver):
+        return analytic_map
+    return AnalyticResolver(analytic_map)
+
+
+# -------------------------------
+# Columnar builder
+# -------------------------------
+def build_journal_frame(gl_df: pd.DataFrame, analytic_map) -> pd.DataFrame:
+    """
+    Build the odoo_journal_import rows from whole-column operations.
+    Expects a frame already passed through prepare_gl; analytic_map is the mapping dict
+    or an AnalyticResolver to share its cache and unmapped-token report across calls.
+    """
+    # Same order as groupby("Document Number"): sorted documents, original line order within each
+    df = gl_df.sort_values("Document Number", kind="mergesort")
+    doc = df["Document Number"]
+    first = ~doc.duplicated()
+
+    local = df["Amount in local currency"]
+    signed_total = df.groupby("Document Number", sort=False)["Amount in doc. curr."].transform("sum")
+
+    raw_date = pd.to_datetime(_col(df, "Document Date", None), errors="coerce")
+    date = raw_date.dt.strftime("%Y-%m-%d").where(raw_date.notna(), "")
+
+    # row.get("Text") or row.get("Name of offsetting account", "") -- NaN is truthy, only empties fall back
+    text = _col(df, "Text", None)
+    label = text.where(~text.map(operator.not_).astype(bool), _col(df, "Name of offsetting account", ""))
+
+    vendor = _col(df, "Vendor Name", "")
+    partner = vendor.where(vendor.notna(), "").astype(str).str.strip()
+
+    def header(values):
+        if not isinstance(values, pd.Series):
+            values = pd.Series(values, index=df.index, dtype=object)
+        return values.astype(object).where(first, "")
+
+    out = pd.DataFrame({
+        "Reference": header(doc),
+        "Company": header(_col(df, "Company Code", "")),
+        "Date": header(date),
+        "Journal": header(JOURNAL_NAME),
+        "Number": "",
+        "Status": header(STATUS),
+        "Total Signed": header(signed_total),
+        "Journal Items/Account": _col(df, "Account", None),
+        "Journal Items/Label": label,
+        "Journal Items/Amount in Currency": df["Amount in doc. curr."],
+        "Journal Items/Partner": partner,
+        "Journal Items/Currency": _col(df, "Document currency", DEFAULT_CURRENCY),
+        "Journal Items/Debit": local.where(local > 0, 0.0),
+        "Journal Items/Credit": (-local).where(local < 0, 0.0),
+        "Journal Items/Analytic Distribution": _as_resolver(analytic_map).resolve_column(df),
+    }, index=df.index)
+
+    return out[OUTPUT_COLUMNS].reset_index(drop=True)
+
+
+# -------------------------------
+# Process-pool sharding
+# -------------------------------
+_worker_resolver = None
+
+
+def _init_worker(analytic_map: dict, max_entries: int):
+    global _worker_resolver
+    _worker_resolver = AnalyticResolver(analytic_map, max_entries)
+
+
+def _build_shard(shard: pd.DataFrame):
+    _worker_resolver.unmapped = Counter()
+    docs = shard["Document Number"].sort_values(kind="mergesort").to_numpy()
+    frame = build_journal_frame(shard, _worker_resolver)
+    return docs, frame, _worker_resolver.unmapped
+
+
+def shard_keys(gl_df: pd.DataFrame, shards: int, shard_by: str = "Company Code") -> np.ndarray:
+    """
+    Assign every line to a shard without ever splitting a document.
+    shard_by="Company Code" keeps each company together (a document listed under several
+    companies follows its first one); shard_by="document" hashes document numbers.
+    """
+    doc = gl_df["Document Number"]
+    if shard_by == "document":
+        return pd.util.hash_array(doc.to_numpy(dtype=object)) % shards
+
+    company = _col(gl_df, shard_by, "").fillna("").astype(str)
+    doc_company = company.groupby(doc, sort=False).transform("first")
+    return pd.factorize(doc_company, sort=True)[0]
+
+
+def build_journal_frame_parallel(gl_df: pd.DataFrame, analytic_map, workers: int,
+                                 shard_by: str = "Company Code") -> pd.DataFrame:
+    """
+    Same output as build_journal_frame, built shard by shard on a process pool.
+    Shards are merged back on the document number with a stable sort, so the result
+    does not depend on which worker finishes first.
+    """
+    keys = shard_keys(gl_df, workers, shard_by)
+    shards = [shard for _, shard in gl_df.groupby(keys, sort=True)]
+    # biggest shards first so one large company does not start last
+    shards.sort(key=len, reverse=True)
+
+    resolver = _as_resolver(analytic_map)
+    initargs = (resolver.analytic_map, resolver.max_entries)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as pool:
+        results = list(pool.map(_build_shard, shards))
+
+    if not results:
+        return build_journal_frame(gl_df, resolver)
+
+    for _, _, unmapped in results:
+        resolver.unmapped.update(unmapped)
+    docs = np.concatenate([d for d, _, _ in results])
+    merged = pd.concat([frame for _, frame, _ in results], ignore_index=True)
+    order = np.argsort(docs, kind="mergesort")
+    return merged.take(order).reset_index(drop=True)
+
+
+# -------------------------------
+# Streaming reader
+# -------------------------------
+def _excel_cell(value):
+    # the cell conversion pandas' openpyxl reader applies before parsing
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _rows_to_frame(rows: list, header_row) -> pd.DataFrame:
+    """A batch of raw sheet rows parsed by the same TextParser read_excel uses, so types match."""
+    data = [list(header_row)]
+    data.extend([_excel_cell(v) for v in row] for row in rows)
+    return TextParser(data, header=0).read()
+
+
+def stream_journal_frames(path, analytic_map, batch_lines: int = 50_000, sheet=None):
+    """
+    Read the GL workbook row by row (read-only openpyxl) and yield finished journal rows in batches.
+
+    A first pass reads only the Document Number column to count each document's lines; the
+    second pass holds the lines of the documents still open and moves a document to the pending
+    batch as soon as its last line has been read. The lines of a document may be spread over the
+    whole extract (e.g. sorted by Account); memory grows with the open documents, not the file.
+    Rows are parsed like read_excel parses them, so each document's lines are exactly those of
+    build_journal_frame on the whole file. Documents come out in the order they are completed,
+    sorted within each batch.
+    """
+    resolver = _as_resolver(analytic_map)
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet] if sheet is not None else wb.active
+        header_row = next(ws.iter_rows(max_row=1, values_only=True))
+        header = [str(h).strip() if h is not None else "" for h in header_row]
+        doc_idx = header.index("Document Number")
+
+        # pass 1: lines per document
+        remaining = Counter(
+            clean_number(v)
+            for (v,) in ws.iter_rows(min_row=2, min_col=doc_idx + 1, max_col=doc_idx + 1, values_only=True)
+        )
+
+        # pass 2: buffer open documents, release each one when its count is reached
+        open_groups = {}
+        current, group = None, None  # last document seen: consecutive lines skip the dict lookup
+        batch = []
+        for values in ws.iter_rows(min_row=2, values_only=True):
+            doc = clean_number(values[doc_idx])
+            remaining[doc] -= 1
+            if all(v is None for v in values):
+                continue
+            if doc != current:
+                current = doc
+                group = open_groups.setdefault(doc, [])
+            group.append(values)
+            if remaining[doc] == 0:
+                batch.extend(open_groups.pop(doc))
+                del remaining[doc]
+                current, group = None, None
+                if len(batch) >= batch_lines:
+                    yield build_journal_frame(prepare_gl(_rows_to_frame(batch, header_row)), resolver)
+                    batch = []
+
+        # documents whose count included blank rows are still open here
+        for rows in open_groups.values():
+            batch.extend(rows)
+        if batch:
+            yield build_journal_frame(prepare_gl(_rows_to_frame(batch, header_row)), resolver)
+    finally:
+        wb.close()
+
+
+# -------------------------------
+# Balance pre-flight check
+# -------------------------------
+BALANCE_COLUMNS = ["Document Number", "Company", "Lines", "Debit", "Credit", "Difference"]
+
+
+def balance_exceptions(frame: pd.DataFrame, tolerance: float = 0.01) -> pd.DataFrame:
+    """
+    Debit/credit totals per document and company in one grouped pass over the journal lines;
+    returns only the documents Odoo would reject as unbalanced.
+    """
+    if frame.empty:
+        return pd.DataFrame(columns=BALANCE_COLUMNS)
+    totals = (
+        pd.DataFrame({
+            "Document Number": document_ids(frame),
+            "Company": header_values(frame, "Company"),
+            "Debit": pd.to_numeric(frame["Journal Items/Debit"]).to_numpy(),
+            "Credit": pd.to_numeric(frame["Journal Items/Credit"]).to_numpy(),
+        })
+        .groupby(["Document Number", "Company"], sort=False, dropna=False)
+        .agg(Lines=("Debit", "size"), Debit=("Debit", "sum"), Credit=("Credit", "sum"))
+        .reset_index()
+    )
+    totals["Difference"] = totals["Debit"] - totals["Credit"]
+    return totals[totals["Difference"].abs() > tolerance][BALANCE_COLUMNS].reset_index(drop=True)
+
+
+# -------------------------------
+# Incremental export
+# -------------------------------
+def header_values(frame: pd.DataFrame, column: str) -> np.ndarray:
+    """Spread a first-line-only header field (Reference, Company, ...) to every line of its document."""
+    starts = frame["Journal"].ne("").to_numpy()
+    return frame[column].to_numpy()[starts][np.cumsum(starts) - 1]
+
+
+def document_ids(frame: pd.DataFrame) -> np.ndarray:
+    """Document number of every journal line."""
+    return header_values(frame, "Reference")
+
+
+def _canonical_value(v):
+    if isinstance(v, (int, float, np.number)) and not isinstance(v, (bool, np.bool_)):
+        return float(v)
+    return v
+
+
+def _canonical_values(col: pd.Series) -> pd.Series:
+    # Hash values, not dtypes: both readers parse alike, but a column can still come out int64 in a
+    # batch whose amounts are all whole and float64 in another
+    if is_bool_dtype(col):
+        return col
+    if is_numeric_dtype(col):
+        return col.astype("float64")
+    return col.map(_canonical_value)
+
+
+def document_fingerprints(frame: pd.DataFrame) -> dict:
+    """Content hash of every document's journal lines, in line order."""
+    if frame.empty:
+        return {}
+    line_hashes = pd.util.hash_pandas_object(frame.apply(_canonical_values), index=False).to_numpy()
+    starts = np.flatnonzero(frame["Journal"].ne("").to_numpy())
+    ends = np.append(starts[1:], len(frame))
+    refs = frame["Reference"].to_numpy()
+    return {
+        str(refs[s]): hashlib.blake2b(line_hashes[s:e].tobytes(), digest_size=16).hexdigest()
+        for s, e in zip(starts, ends)
+    }
+
+
+def load_manifest(path) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_manifest(path, fingerprints: dict):
+    with open(path, "w") as f:
+        json.dump(fingerprints, f, indent=0, sort_keys=True)
+
+
+def select_changed_documents(frame: pd.DataFrame, previous: dict):
+    """
+    Keep only the lines of documents that are new or whose content changed since the previous manifest.
+    Returns (those lines, fingerprints of every document in frame).
+    """
+    current = document_fingerprints(frame)
+    changed = [doc for doc, h in current.items() if previous.get(doc) != h]
+    delta = frame[np.isin(document_ids(frame), changed)].reset_index(drop=True)
+    return delta, current
+
+
+def manifest_summary(previous: dict, current: dict):
+    """Removed document numbers and new/changed/unchanged/removed counts between two manifests."""
+    removed = sorted(set(previous) - set(current))
+    counts = {
+        "new": sum(1 for doc in current if doc not in previous),
+        "changed": sum(1 for doc, h in current.items() if doc in previous and previous[doc] != h),
+        "unchanged": sum(1 for doc, h in current.items() if previous.get(doc) == h),
+        "removed": len(removed),
+    }
+    return removed, counts
+
+
+# -------------------------------
+# Row-by-row builder (reference for parity checks)
+# -------------------------------
+def build_journal_rows_legacy(gl_df: pd.DataFrame, analytic_map: dict) -> pd.DataFrame:
+    output_rows = []
+    grouped = gl_df.groupby("Document Number")
+
+    for doc_number, group in grouped:
+        first = group.iloc[0]
+        reference = doc_number
+        company = first.get("Company Code", "")
+        raw_date = pd.to_datetime(first.get("Document Date"), errors='coerce')
+        date = raw_date.strftime('%Y-%m-%d') if pd.notna(raw_date) else ""
+        journal = JOURNAL_NAME
+        number = ""
+        status = STATUS
+        signed_total = group["Amount in doc. curr."].sum()
+
+        for _, row in group.iterrows():
+            local_amount = row["Amount in local currency"]
+            vendor_name = row.get("Vendor Name", "")
+
+            output_rows.append({
+                "Reference": reference,
+                "Company": company,
+                "Date": date,
+                "Journal": journal,
+                "Number": number,
+                "Status": status,
+                "Total Signed": signed_total,
+                "Journal Items/Account": row.get("Account"),
+                "Journal Items/Label": row.get("Text") or row.get("Name of offsetting account", ""),
+                "Journal Items/Amount in Currency": row["Amount in doc. curr."],
+                "Journal Items/Partner": str(vendor_name).strip() if pd.notna(vendor_name) else "",
+                "Journal Items/Currency": row.get("Document currency", DEFAULT_CURRENCY),
+                "Journal Items/Debit": local_amount if local_amount > 0 else 0.0,
+                "Journal Items/Credit": -local_amount if local_amount < 0 else 0.0,
+                "Journal Items/Analytic Distribution": analytic_json(
+                    [row.get(c, "") for c in ANALYTIC_COLS], analytic_map
+                ),
+            })
+
+            # Reset metadata after the first line
+            reference = company = date = journal = number = status = signed_total = ""
+
+    return pd.DataFrame(output_rows, columns=OUTPUT_COLUMNS)
+
+
+def check_parity(raw_gl_df: pd.DataFrame, analytic_map) -> pd.DataFrame:
+    """Run the row-by-row and columnar builders on the same extract and fail loudly if they differ."""
+    legacy_df = raw_gl_df.copy()
+    legacy_df["Document Number"] = legacy_df["Document Number"].apply(clean_number)
+    legacy_df["Amount in doc. curr."] = pd.to_numeric(legacy_df["Amount in doc. curr."], errors='coerce').fillna(0)
+    legacy_df["Amount in local currency"] = pd.to_numeric(legacy_df["Amount in local currency"], errors='coerce').fillna(0)
+
+    resolver = _as_resolver(analytic_map)
+    expected = build_journal_rows_legacy(legacy_df, resolver.analytic_map)
+    actual = build_journal_frame(prepare_gl(raw_gl_df), resolver)
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+    return actual
@@ -1,97 +1,165 @@
-import pandas as pd
 import json
+import os
+import sys
+from pathlib import Path
 
-# -------------------------------
-# Load data
-# -------------------------------
-gl_df = pd.read_excel("GL Extract Jan to July 2025.xlsx")
-map_df = pd.read_excel("analytic_accounts_mapping.xlsx")
-def clean_number(val):
-    try:
-        return str(int(float(val)))
-    except (ValueError, TypeError):
-        return ""
-
-# Create mapping dict
-analytic_map = dict(zip(map_df['Analytic Account'].astype(str), map_df['ID'].astype(str)))
-
-# Normalize fields
-# gl_df['Document Number'] = gl_df['Document Number'].astype(str)
-gl_df["Document Number"] = gl_df["Document Number"].apply(clean_number)
-gl_df["Amount in doc. curr."] = pd.to_numeric(gl_df["Amount in doc. curr."], errors='coerce').fillna(0)
-gl_df["Amount in local currency"] = pd.to_numeric(gl_df["Amount in local currency"], errors='coerce').fillna(0)
+import numpy as np
+import pandas as pd
 
-# -------------------------------
-# Group and transform
-# -------------------------------
-output_rows = []
-grouped = gl_df.groupby("Document Number")
-
-for doc_number, group in grouped:
-    first = group.iloc[0]
-    reference = doc_number
-    company = first.get("Company Code", "")
-    # date = pd.to_datetime(first.get("Document Date")).strftime('%Y-%m-%d')
-    raw_date = pd.to_datetime(first.get("Document Date"), errors='coerce')
-    date = raw_date.strftime('%Y-%m-%d') if pd.notna(raw_date) else ""
-    journal = "Miscellaneous Operations"
-    number = ""
-    partner = ""
-    status = "Draft"
-    currency = first.get("Document currency", "UGX")
-    signed_total = group["Amount in doc. curr."].sum()
-
-    total_debit = group[group["Amount in local currency"] > 0]["Amount in local currency"].sum()
-    total_credit = -group[group["Amount in local currency"] < 0]["Amount in local currency"].sum()
-
-    for _, row in group.iterrows():
-        account = row.get("Account")
-        label = row.get("Text") or row.get("Name of offsetting account", "")
-        amount_doc = row["Amount in doc. curr."]
-        local_amount = row["Amount in local currency"]
-        debit = local_amount if local_amount > 0 else 0.0
-        credit = -local_amount if local_amount < 0 else 0.0
-
-        # Use Vendor Name directly
-        vendor_name = row.get("Vendor Name", "")
-        vendor = str(vendor_name).strip() if pd.notna(vendor_name) else ""
-
-        # Analytic mapping
-        analytic_dict = {}
-        for col in ["Profit Center", "Cost Center", "WBS element"]:
-            val = row.get(col, "")
-            if pd.notna(val) and val.strip() != "":
-                for entry in str(val).split(","):
-                    entry = entry.strip()
-                    if entry in analytic_map:
-                        analytic_dict[analytic_map[entry]] = 100.0
-        analytic_json = json.dumps(analytic_dict) if analytic_dict else ""
-
-        output_rows.append({
-            "Reference": reference,
-            "Company": company,
-            "Date": date,
-            "Journal": journal,
-            "Number": number,
-            # "Partner": partner,
-            "Status": status,
-            "Total Signed": signed_total,
-            "Journal Items/Account": account,
-            "Journal Items/Label": label,
-            "Journal Items/Amount in Currency": amount_doc,
-            "Journal Items/Partner": vendor,
-            "Journal Items/Currency": row.get("Document currency", "UGX"),
-            "Journal Items/Debit": debit,
-            "Journal Items/Credit": credit,
-            "Journal Items/Analytic Distribution": analytic_json,
-        })
-
-        # Reset metadata after the first line
-        reference = company = date = journal = number = partner = status = signed_total = ""
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # shared helpers at the repo root
+from journal import (
+    OUTPUT_COLUMNS,
+    AnalyticResolver,
+    balance_exceptions,
+    build_journal_frame,
+    build_journal_frame_parallel,
+    check_parity,
+    document_ids,
+    load_analytic_map,
+    load_manifest,
+    manifest_summary,
+    prepare_gl,
+    save_manifest,
+    select_changed_documents,
+    stream_journal_frames,
+)
+from xlcache import read_excel_cached
+from xlwriter import ChunkedSheetWriter, StreamingSheetWriter
 
 # -------------------------------
-# Export
+# Settings
 # -------------------------------
-final_df = pd.DataFrame(output_rows)
-final_df.to_excel("odoo_journal_import.xlsx", index=False)
-print("✅ Done: Exported using Vendor Name directly.")
+GL_FILE = "GL Extract Jan to July 2025.xlsx"
+MAP_FILE = "analytic_accounts_mapping.xlsx"
+OUTPUT_FILE = "odoo_journal_import.xlsx"  # or .csv for an Odoo-compatible CSV
+UNMAPPED_FILE = "unmapped_analytic_accounts.xlsx"  # tokens not found in MAP_FILE, with line counts
+ANALYTIC_CACHE_SIZE = 100_000  # distinct (profit center, cost center, WBS) combinations kept resolved
+PARITY_CHECK = False  # set to True to also run the old row-by-row builder and compare
+STREAMING = False     # read the GL extract row by row (two passes), in any line order
+BATCH_LINES = 50_000  # finished journal lines built per batch in streaming mode
+WORKERS = 0           # > 1 builds shards on a process pool; output is identical to a serial run
+SHARD_BY = "Company Code"  # or "document" to spread one big company over hashed document numbers
+INCREMENTAL = False   # export only documents that are new or changed since the last run
+MANIFEST_FILE = "odoo_journal_manifest.json"     # per-document content hashes from the last run
+REMOVED_FILE = "odoo_journal_removed_documents.xlsx"  # documents in the last run but not in this extract
+EXCEPTIONS_FILE = "odoo_journal_exceptions.xlsx"  # unbalanced documents found before export
+BALANCE_TOLERANCE = 0.01  # allowed |debit - credit| per document, in local currency
+SKIP_UNBALANCED = False   # True leaves unbalanced documents out of the import file
+CHUNK_LINES = 0           # > 0 splits the import into files of at most this many lines, whole documents only
+CHUNKS_MANIFEST_FILE = "odoo_journal_chunks.json"  # which documents went into which chunk file
+
+
+def remove_previous_chunks(manifest_path, output_file):
+    """Delete the chunk files the last run listed, so a shorter run leaves no stale chunks to import."""
+    if not os.path.exists(manifest_path):
+        return 0
+    with open(manifest_path, "r") as f:
+        chunks = json.load(f).get("chunks", [])
+    folder = os.path.dirname(output_file)
+    removed = 0
+    for chunk in chunks:
+        path = os.path.join(folder, chunk["file"])
+        if os.path.exists(path):
+            os.remove(path)
+            removed += 1
+    return removed
+
+
+def main():
+    # -------------------------------
+    # Load data
+    # -------------------------------
+    map_df = read_excel_cached(MAP_FILE)
+
+    # Create mapping dict and a resolver that serializes each combination once
+    analytic_map = load_analytic_map(map_df)
+    resolver = AnalyticResolver(analytic_map, ANALYTIC_CACHE_SIZE)
+
+    # -------------------------------
+    # Group and transform
+    # -------------------------------
+    if STREAMING:
+        # Only open documents and one batch of finished lines are held while reading
+        frames = stream_journal_frames(GL_FILE, resolver, batch_lines=BATCH_LINES)
+    else:
+        gl_df = read_excel_cached(GL_FILE)
+        if PARITY_CHECK:
+            final_df = check_parity(gl_df, resolver)
+            print("✅ Parity check passed: columnar output matches the row-by-row builder.")
+        elif WORKERS > 1:
+            final_df = build_journal_frame_parallel(prepare_gl(gl_df), resolver, WORKERS, SHARD_BY)
+        else:
+            final_df = build_journal_frame(prepare_gl(gl_df), resolver)
+        del gl_df
+        frames = [final_df]
+
+    # -------------------------------
+    # Export (rows go straight into a write-only workbook / CSV)
+    # -------------------------------
+    previous = load_manifest(MANIFEST_FILE) if INCREMENTAL else {}
+    fingerprints = {}
+    exceptions = []
+    if CHUNK_LINES > 0:
+        remove_previous_chunks(CHUNKS_MANIFEST_FILE, OUTPUT_FILE)
+        writer = ChunkedSheetWriter(OUTPUT_FILE, OUTPUT_COLUMNS, CHUNK_LINES, key_column="Reference")
+    else:
+        writer = StreamingSheetWriter(OUTPUT_FILE)
+        writer.add_sheet("Sheet1", OUTPUT_COLUMNS)
+    with writer:
+        for frame in frames:
+            # Pre-flight: documents Odoo would reject, checked before their lines are written
+            unbalanced = balance_exceptions(frame, BALANCE_TOLERANCE)
+            skipped = unbalanced["Document Number"].unique() if SKIP_UNBALANCED else []
+            if not unbalanced.empty:
+                exceptions.append(unbalanced)
+            if INCREMENTAL:
+                # fingerprint every document, skipped ones included, so none of them looks removed;
+                # a skipped document keeps the hash it was last exported with (or stays new)
+                frame, current = select_changed_documents(frame, previous)
+                for doc in map(str, skipped):
+                    if doc in previous:
+                        current[doc] = previous[doc]
+                    else:
+                        current.pop(doc, None)
+                fingerprints.update(current)
+            if len(skipped):
+                frame = frame[~np.isin(document_ids(frame), skipped)].reset_index(drop=True)
+            if CHUNK_LINES > 0:
+                writer.write_frame(frame, frame["Journal"].ne(""))
+            else:
+                writer.write_frame(frame)
+
+    if CHUNK_LINES > 0:
+        with open(CHUNKS_MANIFEST_FILE, "w") as f:
+            json.dump({"source": GL_FILE, "max_lines": CHUNK_LINES, "chunks": writer.chunks}, f, indent=2)
+        lines = sum(c["lines"] for c in writer.chunks)
+        print(f"✅ Done: Exported {lines} journal lines in {len(writer.chunks)} file(s), see '{CHUNKS_MANIFEST_FILE}'")
+    else:
+        print(f"✅ Done: Exported {writer.rows_written} journal lines using Vendor Name directly.")
+
+    if exceptions:
+        exceptions_df = pd.concat(exceptions, ignore_index=True)
+        exceptions_df.to_excel(EXCEPTIONS_FILE, index=False, sheet_name="Unbalanced")
+        action = "left out of" if SKIP_UNBALANCED else "still in"
+        print(f"⚠️ {len(exceptions_df)} unbalanced document(s) {action} the import, see '{EXCEPTIONS_FILE}'")
+    elif os.path.exists(EXCEPTIONS_FILE):
+        os.remove(EXCEPTIONS_FILE)  # last run's list would otherwise look current
+
+    if INCREMENTAL:
+        removed, counts = manifest_summary(previous, fingerprints)
+        pd.DataFrame({"Reference": removed}).to_excel(REMOVED_FILE, index=False)
+        print(
+            f"ℹ️ Documents: {counts['new']} new, {counts['changed']} changed, "
+            f"{counts['unchanged']} unchanged, {counts['removed']} removed (see '{REMOVED_FILE}')"
+        )
+        # Only move the manifest forward once the import file is written
+        save_manifest(MANIFEST_FILE, fingerprints)
+
+    unmapped = resolver.unmapped_report()
+    if not unmapped.empty:
+        unmapped.to_excel(UNMAPPED_FILE, index=False)
+        print(f"⚠️ {len(unmapped)} analytic account(s) not in '{MAP_FILE}', see '{UNMAPPED_FILE}'")
+
+
+if __name__ == "__main__":
+    main()
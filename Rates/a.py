@@ -1,32 +1,23 @@
-import pandas as pd
-from datetime import datetime
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # shared helpers at the repo root
+from rates import read_normalized, rewrite_rate_headers
 
 # === Settings ===
 INPUT_FILE  = "sap_rates_template.xlsx"          # <-- change to your source file
 OUTPUT_FILE = "sap_rates_normalized.xlsx"   # <-- output with fixed headers
+STREAMING = True  # rewrite the header row and copy data rows through; False loads the whole sheet with pandas
+# The next steps (map.py, main.py, usdaed.py) also normalize headers when they read,
+# so they can be pointed at INPUT_FILE directly and this step skipped.
 
-# === Step 1: Load the Excel file ===
-df = pd.read_excel(INPUT_FILE)
-
-# === Step 2: Normalize all headers ===
-new_cols = []
-
-for col in df.columns:
-    # Case 1: already a datetime (from Excel formatting)
-    if isinstance(col, datetime):
-        new_cols.append(col.strftime("%d.%m.%Y"))
-
-    # Case 2: string that looks like a date (e.g. "9/9/2020")
-    else:
-        try:
-            parsed = pd.to_datetime(str(col).strip(), dayfirst=True, errors='raise')
-            new_cols.append(parsed.strftime("%d.%m.%Y"))
-        except:
-            new_cols.append(str(col).strip())  # keep as is (e.g. "Country")
-
-# Apply the cleaned header
-df.columns = new_cols
+if STREAMING:
+    # === Header row normalized, data cells streamed through unchanged ===
+    rows = rewrite_rate_headers(INPUT_FILE, OUTPUT_FILE)
+else:
+    # === Whole sheet in memory, headers normalized in one batch ===
+    df = read_normalized(INPUT_FILE)
+    df.to_excel(OUTPUT_FILE, index=False)
+    rows = len(df)
 
-# === Step 3: Save to a new file ===
-df.to_excel(OUTPUT_FILE, index=False)
-print(f"✅ Saved normalized file: {OUTPUT_FILE}")
+print(f"✅ Saved normalized file: {OUTPUT_FILE} ({rows} rate rows)")
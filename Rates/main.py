@@ -1,6 +1,18 @@
 import pandas as pd
-from datetime import datetime
-import re
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # shared helpers at the repo root
+from rates import (
+    add_currency_headers,
+    company_rates,
+    load_watermarks,
+    melt_rates,
+    read_rate_matrix,
+    require_columns,
+    save_watermarks,
+    select_new_rates,
+)
 
 INPUT_FILE = "sap_rates_today.xlsx"   # normalized file
 OUTPUT_FILE = "odoo_currency_rates_all_one_sheet.xlsx"
@@ -8,8 +20,10 @@ OUTPUT_FILE = "odoo_currency_rates_all_one_sheet.xlsx"
 # Date range (DD.MM.YYYY)
 DATE_FROM = "25.11.2025"
 DATE_TO   = "08.12.2025"
-date_from_dt = datetime.strptime(DATE_FROM, "%d.%m.%Y")
-date_to_dt   = datetime.strptime(DATE_TO, "%d.%m.%Y")
+
+# Incremental publishing: only rates newer than the last exported date per (currency, company)
+INCREMENTAL = False
+STATE_FILE = "odoo_currency_rates_state.json"
 
 CURRENCY_META = {
     "AED": ("base.AED", "AED"),
@@ -62,108 +76,31 @@ COUNTRY_TO_COMPANIES = {
     # "Saudi Arabia": ["SA10"],
 }
 
-def clean_cell(val):
-    if isinstance(val, str):
-        return val.replace("\xa0", " ").strip()
-    return val
-
 # ─────── Read normalized file ─────────────────────────────────
-df = pd.read_excel(INPUT_FILE)
-df.columns = [str(c).strip() for c in df.columns]
-
-# Clean object columns safely
-for i in range(df.shape[1]):
-    if df.iloc[:, i].dtype == object:
-        df.iloc[:, i] = df.iloc[:, i].apply(clean_cell)
+# Header row first, then only Country / From / To and the date columns in DATE_FROM..DATE_TO
+df, date_cols = read_rate_matrix(INPUT_FILE, DATE_FROM, DATE_TO)
 
 country_col = "Country"
 from_col = "From Currency"
 to_col = "To currency"
 
-for req in (country_col, from_col, to_col):
-    if req not in df.columns:
-        raise ValueError(f"Missing column '{req}'. Found: {list(df.columns)[:30]} ...")
-
-# Date columns are DD.MM.YYYY strings
-date_cols_all = [c for c in df.columns if re.fullmatch(r"\d{2}\.\d{2}\.\d{4}", str(c))]
-
-# Filter by date range
-date_cols = []
-for c in date_cols_all:
-    dt = datetime.strptime(c, "%d.%m.%Y")
-    if date_from_dt <= dt <= date_to_dt:
-        date_cols.append(c)
-
-if not date_cols:
-    raise ValueError(
-        f"No date columns matched {DATE_FROM} to {DATE_TO}. "
-        f"Found date columns like: {date_cols_all[:5]}"
-    )
-
-date_cols = sorted(date_cols, key=lambda x: datetime.strptime(x, "%d.%m.%Y"))
-date_cols_desc = list(reversed(date_cols))
-iso_map = {c: datetime.strptime(c, "%d.%m.%Y").strftime("%Y-%m-%d") for c in date_cols}
-
-# ─────── Build rows (no header logic here) ────────────────────
-raw_rows = []
-
-for _, r in df.iterrows():
-    sap_country = str(r.get(country_col, "")).strip()
-    to_cur = str(r.get(to_col, "")).strip().upper()
-
-    if not sap_country or not to_cur:
-        continue
-    if to_cur not in CURRENCY_META:
-        continue
-
-    companies = COUNTRY_TO_COMPANIES.get(sap_country)
-    if not companies:
-        continue
-
-    for dcol in date_cols_desc:
-        rate = r.get(dcol)
-        if pd.isna(rate):
-            continue
-
-        iso_date = iso_map[dcol]
-
-        for company in companies:
-            raw_rows.append({
-                "Rates/Date": iso_date,
-                "Rates/Inverse Company Rate": float(rate),
-                "Rates/Currency": to_cur,
-                "Rates/Company": company,
-            })
-
-out = pd.DataFrame(raw_rows)
-
-# Remove duplicates BEFORE grouping (this fixes Odoo unique constraint issues)
-out = out.drop_duplicates(
-    subset=["Rates/Date", "Rates/Currency", "Rates/Company"],
-    keep="last"
-)
+require_columns(df, country_col, from_col, to_col)
+
+# ─────── Wide -> long, then join countries to companies ───────
+# One row per (SAP row, day) with a rate; duplicates removed BEFORE grouping
+# (this fixes Odoo unique constraint issues), then grouped by currency, newest date first
+long = melt_rates(df, date_cols)
+out = company_rates(long, COUNTRY_TO_COMPANIES, CURRENCY_META)
 
-# ─────── Force grouping by currency (THIS fixes your header issue) ───────
-# Sort so currencies are grouped together, and within each currency newest date first
-out = out.sort_values(
-    by=["Rates/Currency", "Rates/Date", "Rates/Company"],
-    ascending=[True, False, True]
-).reset_index(drop=True)
+if INCREMENTAL:
+    state = load_watermarks(STATE_FILE)
+    out, state[OUTPUT_FILE] = select_new_rates(out, state.get(OUTPUT_FILE, {}))
+    if out.empty:
+        print(f"ℹ️ No rates newer than the last export (see '{STATE_FILE}'). Nothing written.")
+        sys.exit(0)
 
 # Now add the header row once per currency group (top of each block)
-out["External ID"] = ""
-out["Symbol"] = ""
-out["Active"] = ""
-
-for cur, (ext_id, sym) in CURRENCY_META.items():
-    # first row index of that currency block
-    idx = out.index[out["Rates/Currency"] == cur]
-    if len(idx) == 0:
-        continue
-    first_idx = idx[0]
-    out.at[first_idx, "External ID"] = ext_id
-    out.at[first_idx, "Symbol"] = sym
-    out.at[first_idx, "Active"] = "TRUE"
+out = add_currency_headers(out, CURRENCY_META, id_col="External ID")
 
 # Final column order
 out = out[[
@@ -175,4 +112,9 @@ out = out[[
 with pd.ExcelWriter(OUTPUT_FILE, engine="openpyxl") as writer:
     out.to_excel(writer, index=False, sheet_name="Rates")
 
+# Only move the watermarks forward once the file is written
+if INCREMENTAL:
+    save_watermarks(STATE_FILE, state)
+    print(f"ℹ️ {len(out)} new rate line(s); watermarks saved to '{STATE_FILE}'.")
+
 print(f"✅ Done. Saved '{OUTPUT_FILE}'. Grouped by currency with header at top of each currency block.")
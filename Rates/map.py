@@ -1,9 +1,16 @@
-import pandas as pd
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # shared helpers at the repo root
+from rates import clean_rate_frame, country_sheet, read_normalized
+from xlwriter import StreamingSheetWriter
 
 # ─────── 1. Input/output ─────────────────────────────────────
 INPUT_FILE = "sap_rates_normalized.xlsx"
 OUTPUT_FILE = "odoo_currency_rates_all.xlsx"
+WORKERS = 0  # > 1 builds the country sheets on a process pool; output is identical
 
 CURRENCY_META = {
     "AED": ("base.AED", "AED"),
@@ -31,68 +38,47 @@ CURRENCY_META = {
 }
 
 # ─────── 2. Read and clean ───────────────────────────────────
-df = pd.read_excel(INPUT_FILE)
-df.columns = [str(c).strip() for c in df.columns]
-
-def clean_cell(val):
-    if isinstance(val, str):
-        return val.replace('\xa0', ' ').strip()
-    return val
+def date_columns(columns):
+    """DD.MM.YYYY / datetime headers, newest first (reverse sheet order), with their ISO dates."""
+    date_cols = [
+        col for col in columns
+        if (isinstance(col, str) and col.count('.') == 2 and len(col) == 10) or isinstance(col, datetime)
+    ]
+    date_cols_desc = date_cols[::-1]
+    iso = [
+        datetime.strptime(col, "%d.%m.%Y").strftime("%Y-%m-%d") if isinstance(col, str) else col.strftime("%Y-%m-%d")
+        for col in date_cols_desc
+    ]
+    return date_cols_desc, iso
 
-df["Country"] = df["Country"].apply(clean_cell)
-df["To currency"] = df["To currency"].apply(clean_cell)
 
-# Detect and format date columns
-date_cols = [
-    col for col in df.columns
-    if isinstance(col, (str, datetime)) and (
-        (isinstance(col, str) and col.count('.') == 2 and len(col) == 10)
-        or isinstance(col, datetime)
-    )
-]
-
-iso_map = {
-    col: datetime.strptime(col, "%d.%m.%Y").strftime("%Y-%m-%d")
-    if isinstance(col, str) else col.strftime("%Y-%m-%d")
-    for col in date_cols
-}
-date_cols_desc = date_cols[::-1]
+def build_sheet(args):
+    group, date_cols_desc, iso = args
+    return country_sheet(group, date_cols_desc, iso, CURRENCY_META)
 
-# ─────── 3. Build output ─────────────────────────────────────
-with pd.ExcelWriter(OUTPUT_FILE, engine="openpyxl") as writer:
-    for country, group in df.groupby("Country"):
-        rows = []
-        seen = set()  # track (currency) per country only
 
-        for _, row in group.iterrows():
-            currency = str(row["To currency"]).strip().upper()
-            if not currency or currency not in CURRENCY_META:
-                continue
+def main():
+    df = clean_rate_frame(read_normalized(INPUT_FILE))  # the raw template works too
+    date_cols_desc, iso = date_columns(df.columns)
 
-            curr_id, symbol = CURRENCY_META[currency]
-            currency_key = currency  # track only within current country
+    # ─────── 3. Build one frame per country ──────────────────
+    countries, groups = zip(*df.groupby("Country")) if len(df) else ((), ())
+    jobs = [(group, date_cols_desc, iso) for group in groups]
+    if WORKERS > 1:
+        with ProcessPoolExecutor(max_workers=WORKERS) as pool:
+            sheets = list(pool.map(build_sheet, jobs))
+    else:
+        sheets = [build_sheet(job) for job in jobs]
 
-            is_first_for_currency = currency_key not in seen
+    # ─────── 4. Write (rows stream into a write-only workbook) ──
+    with StreamingSheetWriter(OUTPUT_FILE) as writer:
+        for country, out in zip(countries, sheets):
+            if not out.empty:
+                writer.add_sheet(country[:31], out.columns)
+                writer.write_frame(out)
 
-            for old_date in date_cols_desc:
-                rate = row.get(old_date)
-                if pd.isna(rate):
-                    continue
-                iso_date = iso_map[old_date]
-                rows.append({
-                    "id": curr_id if is_first_for_currency else "",
-                    "Symbol": symbol if is_first_for_currency else "",
-                    "Active": "TRUE" if is_first_for_currency else "",
-                    "Rates/Date": iso_date,
-                    "Rates/Inverse Company Rate": round(rate, 2),
-                    "Rates/Currency": currency
-                })
-                if is_first_for_currency:
-                    seen.add(currency_key)
-                    is_first_for_currency = False  # Only once
+    print(f"✅ Done. Saved '{OUTPUT_FILE}' with one-time currency tagging per country.")
 
-        if rows:
-            out = pd.DataFrame(rows)
-            out.to_excel(writer, index=False, sheet_name=country[:31])
 
-print(f"✅ Done. Saved '{OUTPUT_FILE}' with one-time currency tagging per country.")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,500 @@
+import json
+import os
+import re
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+from xlcache import read_excel_cached
+from xlwriter import StreamingSheetWriter
+
+# SAP rate matrix layout: one row per (Country, From Currency, To currency), one column per day (DD.MM.YYYY)
+COUNTRY_COL = "Country"
+FROM_COL = "From Currency"
+TO_COL = "To currency"
+DATE_FORMAT = "%d.%m.%Y"
+DATE_HEADER = re.compile(r"\d{2}\.\d{2}\.\d{4}")
+
+# Header spellings of a day in SAP templates, besides Excel date cells
+HEADER_FORMATS = [
+    (r"\d{1,2}\.\d{1,2}\.\d{4}", "%d.%m.%Y"),  # 04.01.2016
+    (r"\d{1,2}/\d{1,2}/\d{4}", "%d/%m/%Y"),      # 9/9/2020 (day first)
+]
+
+
+def clean_rate_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Strip headers and non-breaking spaces in text cells, one column at a time instead of cell by cell."""
+    df = df.copy()
+    df.columns = [str(c).strip() for c in df.columns]
+    for i in range(df.shape[1]):
+        col = df.iloc[:, i]
+        if col.dtype == object:
+            is_str = col.map(type).eq(str).to_numpy()
+            if is_str.any():
+                cleaned = col.to_numpy(copy=True)
+                cleaned[is_str] = col[is_str].str.replace("\xa0", " ").str.strip().to_numpy()
+                df.isetitem(i, pd.Series(cleaned, index=df.index, dtype=object))
+    return df
+
+
+def normalize_date_headers(columns) -> list:
+    """
+    Date headers as DD.MM.YYYY; any other header is stripped (e.g. "Country "), empty stays None.
+    Excel date cells (datetime headers) and the HEADER_FORMATS spellings are recognised explicitly
+    and parsed with one pd.to_datetime call per format; impossible dates (31.02.2016) stay text.
+    """
+    columns = list(columns)
+    out = pd.Series([None if c is None else str(c).strip() for c in columns], dtype=object)
+
+    is_date = np.array([isinstance(c, date) for c in columns], dtype=bool)
+    if is_date.any():
+        out[is_date] = pd.to_datetime(pd.Series(columns, dtype=object)[is_date]).dt.strftime(DATE_FORMAT)
+
+    text = out.where(~is_date & out.notna())
+    for pattern, fmt in HEADER_FORMATS:
+        match = text.str.fullmatch(pattern, na=False).astype(bool)
+        if match.any():
+            parsed = pd.to_datetime(text[match], format=fmt, errors="coerce")
+            ok = parsed.notna()
+            out[ok[ok].index] = parsed[ok].dt.strftime(DATE_FORMAT)
+            text[match] = None
+    return out.tolist()
+
+
+def read_normalized(path) -> pd.DataFrame:
+    """The rate matrix in memory with normalized headers, ready for the next rates step."""
+    df = read_excel_cached(path)
+    df.columns = normalize_date_headers(df.columns)
+    return df
+
+
+def rewrite_rate_headers(src, dst, sheet=None) -> int:
+    """
+    Copy the first sheet of src (or sheet) to dst with normalized headers. Data rows are read and
+    written one at a time with their cell values unchanged, so the matrix is never held in memory.
+    Returns the number of data rows.
+    """
+    wb = load_workbook(src, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet] if sheet is not None else wb.worksheets[0]
+        rows = ws.iter_rows(values_only=True)
+        header = normalize_date_headers(next(rows, ()))
+        with StreamingSheetWriter(dst) as writer:
+            writer.add_sheet("Sheet1", header)
+            return writer.write_rows(rows)
+    finally:
+        wb.close()
+
+
+def require_columns(df: pd.DataFrame, *cols):
+    for req in cols:
+        if req not in df.columns:
+            raise ValueError(f"Missing column '{req}'. Found: {list(df.columns)[:30]} ...")
+
+
+def date_index(columns):
+    """
+    Parse the DD.MM.YYYY headers once into a sorted index.
+    Returns (dates, names): datetime64 days in ascending order and the header for each.
+    """
+    names = np.array([c for c in columns if DATE_HEADER.fullmatch(str(c).strip())], dtype=object)
+    text = [str(c).strip() for c in names]
+    dates = pd.to_datetime(pd.Index(text, dtype=object), format=DATE_FORMAT).to_numpy(dtype="datetime64[D]")
+    order = np.argsort(dates, kind="mergesort")
+    return dates[order], names[order]
+
+
+def select_date_columns(columns, date_from: str, date_to: str) -> list:
+    """DD.MM.YYYY headers between date_from and date_to (inclusive), oldest first."""
+    dates, names = date_index(columns)
+    bounds = pd.to_datetime([date_from, date_to], format=DATE_FORMAT).to_numpy(dtype="datetime64[D]")
+    lo = np.searchsorted(dates, bounds[0], side="left")
+    hi = np.searchsorted(dates, bounds[1], side="right")
+    date_cols = list(names[lo:hi])
+    if not date_cols:
+        raise ValueError(
+            f"No date columns matched {date_from} to {date_to}. "
+            f"Found date columns like: {list(names[:5])}"
+        )
+    return date_cols
+
+
+def read_rate_matrix(path, date_from: str, date_to: str):
+    """
+    Load only Country, From/To currency and the date columns in [date_from, date_to].
+    The header row is read on its own first and normalized (so a raw SAP template works too);
+    the columns come from the workbook's parquet sidecar (see xlcache), so a two-week run does
+    not load years of daily columns.
+    Returns (cleaned frame, selected date columns oldest first).
+    """
+    header = list(read_excel_cached(path, nrows=0).columns)
+    names = normalize_date_headers(header)
+    raw = dict(zip(names, header))
+    key_cols = [n for n in names if n in (COUNTRY_COL, FROM_COL, TO_COL)]
+    date_cols = select_date_columns(names, date_from, date_to)
+
+    wanted = key_cols + date_cols
+    df = read_excel_cached(path, columns=[raw[n] for n in wanted])
+    df.columns = wanted
+    return clean_rate_frame(df), date_cols
+
+
+def melt_rates(df: pd.DataFrame, date_cols: list) -> pd.DataFrame:
+    """
+    Wide SAP matrix -> one row per (SAP row, day) with a rate.
+    Columns: row (position in the SAP sheet), Country, From, To, Date (ISO), Rate.
+    """
+    keys = pd.DataFrame({
+        "row": np.arange(len(df)),
+        "Country": df[COUNTRY_COL].astype(str).str.strip().to_numpy() if COUNTRY_COL in df else "",
+        "From": df[FROM_COL].astype(str).str.strip().str.upper().to_numpy() if FROM_COL in df else "",
+        "To": df[TO_COL].astype(str).str.strip().str.upper().to_numpy() if TO_COL in df else "",
+    })
+    iso = pd.to_datetime(pd.Index(date_cols), format=DATE_FORMAT).strftime("%Y-%m-%d")
+
+    values = df[date_cols].to_numpy(dtype=float)
+    r, d = np.nonzero(~np.isnan(values))
+    long = keys.iloc[r].reset_index(drop=True)
+    long["Date"] = iso.to_numpy()[d]
+    long["Rate"] = values[r, d]
+    return long
+
+
+def round_rates(rates: pd.Series, ndigits: int) -> pd.Series:
+    """Python's round() applied once per distinct rate, so results match the old per-cell round(float(rate), n)."""
+    uniq, inv = np.unique(rates.to_numpy(dtype=float), return_inverse=True)
+    rounded = np.array([round(float(v), ndigits) for v in uniq], dtype=float)
+    return pd.Series(rounded[inv.ravel()], index=rates.index)
+
+
+def country_sheet(group: pd.DataFrame, date_cols: list, iso_dates, currency_meta: dict,
+                  rate_col: str = "Rates/Inverse Company Rate", ndigits: int = 2) -> pd.DataFrame:
+    """
+    One country's Odoo sheet: a line per (SAP row, date) with a rate, SAP rows in sheet order and
+    dates in the order of date_cols; To currencies outside currency_meta are skipped. The first
+    line of each currency in the country carries id / Symbol / Active.
+    """
+    currency = group[TO_COL].astype(str).str.strip().str.upper().to_numpy()
+    keep = np.isin(currency, list(currency_meta))
+    values = group.loc[keep, date_cols].to_numpy(dtype=float)
+    r, d = np.nonzero(~np.isnan(values))
+
+    cur = currency[keep][r]
+    first = ~pd.Series(cur).duplicated().to_numpy()
+    meta = np.array([currency_meta[c] for c in cur[first]], dtype=object).reshape(-1, 2)
+
+    out = pd.DataFrame({
+        "id": "",
+        "Symbol": "",
+        "Active": np.where(first, "TRUE", ""),
+        "Rates/Date": np.asarray(iso_dates, dtype=object)[d],
+        rate_col: round_rates(pd.Series(values[r, d]), ndigits).to_numpy(),
+        "Rates/Currency": cur,
+    })
+    out.loc[first, "id"] = meta[:, 0]
+    out.loc[first, "Symbol"] = meta[:, 1]
+    return out
+
+
+def company_rates(long: pd.DataFrame, country_to_companies: dict, currency_meta: dict,
+                  rate_col: str = "Rates/Inverse Company Rate") -> pd.DataFrame:
+    """
+    Join the long rates against the country -> company table.
+    When several SAP rows give the same (date, currency, company), the lowest one in the sheet wins,
+    like the old keep="last" de-duplication. Sorted by currency, newest date first, company.
+
+    Date, currency and company stay integer codes while joining, de-duplicating and sorting (one
+    packed int64 key per line); they come back as categoricals, decoded to text only when written.
+    """
+    pairs = [(country, company) for country, codes in country_to_companies.items() for company in codes]
+    rates = long[long["To"].isin(currency_meta.keys()) & long["To"].ne("")]
+
+    countries = pd.Index(list(dict.fromkeys(country for country, _ in pairs)), dtype=object)
+    companies = np.array(sorted({company for _, company in pairs}), dtype=object)
+    pair_country = countries.get_indexer([country for country, _ in pairs])
+    pair_order = np.argsort(pair_country, kind="stable")
+    pair_company = np.searchsorted(companies, [company for _, company in pairs])[pair_order]
+    first_pair = np.searchsorted(pair_country[pair_order], np.arange(len(countries)))
+    per_country = np.bincount(pair_country, minlength=len(countries))
+
+    # one line per (SAP line, company of its country)
+    country = countries.get_indexer(rates["Country"])
+    n = np.where(country >= 0, per_country[np.maximum(country, 0)], 0)
+    line = np.repeat(np.arange(len(rates)), n)
+    nth = np.arange(len(line)) - np.repeat(np.cumsum(n) - n, n)
+    company = pair_company[first_pair[country[line]] + nth]
+
+    dates, date = np.unique(rates["Date"].to_numpy(dtype=object), return_inverse=True)
+    currencies, currency = np.unique(rates["To"].to_numpy(dtype=object), return_inverse=True)
+    date, currency = date.ravel()[line], currency.ravel()[line]
+
+    # currency asc, date desc, company asc; among equal keys the SAP row furthest down the sheet comes first and is kept
+    key = (currency.astype(np.int64) * len(dates) + (len(dates) - 1 - date)) * len(companies) + company
+    order = np.lexsort((-rates["row"].to_numpy()[line], key))
+    keep = order[np.r_[True, key[order][1:] != key[order][:-1]]] if len(order) else order
+
+    return pd.DataFrame({
+        "Rates/Date": pd.Categorical.from_codes(date[keep], dates),
+        rate_col: rates["Rate"].to_numpy(dtype=float)[line[keep]],
+        "Rates/Currency": pd.Categorical.from_codes(currency[keep], currencies),
+        "Rates/Company": pd.Categorical.from_codes(company[keep], companies),
+    })
+
+
+def consolidation_rates(long: pd.DataFrame, target: str, currency_meta: dict,
+                        rate_col: str = "Rates/Company Rate") -> pd.DataFrame:
+    """
+    Rates of every currency against one target (all vs USD, all vs AED, ...): SAP rows whose
+    To currency is the target; the From currency becomes the Rates/Currency being defined.
+    De-duplicated per day and currency (lowest SAP row wins), sorted by currency, newest date first.
+    """
+    target = target.upper()
+    rates = long[long["To"].eq(target) & long["From"].isin(currency_meta.keys())]
+    out = rates.rename(columns={"Date": "Rates/Date", "Rate": rate_col, "From": "Rates/Currency"})
+    out = out.sort_values("row", kind="mergesort").drop_duplicates(
+        subset=["Rates/Date", "Rates/Currency"], keep="last"
+    )
+    out = out.sort_values(by=["Rates/Currency", "Rates/Date"], ascending=[True, False]).reset_index(drop=True)
+    return out[["Rates/Date", rate_col, "Rates/Currency"]]
+
+
+def _place(m: np.ndarray, d: np.ndarray, c: np.ndarray, values: np.ndarray) -> bool:
+    """Write values into empty cells (d, c) of m; where several target one cell the first wins."""
+    cells, first = np.unique(d * m.shape[1] + c, return_index=True)
+    first = first[np.isnan(m.flat[cells])]
+    m[d[first], c[first]] = values[first]
+    return len(first) > 0
+
+
+def currency_matrix(long: pd.DataFrame, pivot: str = "USD"):
+    """
+    Dense date x currency matrix: units of each currency per one unit of the pivot.
+    SAP rows say "From per To = Rate". The matrix is seeded from the rows quoted against the
+    pivot, either way round (X per USD gives X = Rate, USD per X gives X = 1 / Rate, the former
+    winning where SAP has both). Only then does any other row place its missing side from the
+    one already on the matrix (F = Rate * T, T = F / Rate), pass after pass, so a currency reaches
+    the pivot through any chain of quotes. A cell is written once: when several rows would fill
+    it in the same pass, the one higher up the SAP sheet wins.
+    Returns (ISO dates, currencies, matrix); NaN where a currency cannot be reached that day.
+    """
+    pivot = pivot.upper()
+    pairs = long[long["From"].ne("") & long["To"].ne("") & long["From"].ne(long["To"]) & long["Rate"].gt(0)]
+    pairs = pairs.sort_values("row", kind="mergesort").drop_duplicates(["Date", "From", "To"], keep="last")
+
+    dates, d = np.unique(pairs["Date"].to_numpy(dtype=object), return_inverse=True)
+    currencies, codes = np.unique(
+        np.concatenate([pairs["From"].to_numpy(dtype=object), pairs["To"].to_numpy(dtype=object), [pivot]]),
+        return_inverse=True,
+    )
+    f, t = codes[: len(pairs)], codes[len(pairs): 2 * len(pairs)]
+    v = pairs["Rate"].to_numpy(dtype=float)
+    p = np.searchsorted(currencies, pivot)
+
+    m = np.full((len(dates), len(currencies)), np.nan)
+    m[:, p] = 1.0
+    to_pivot, from_pivot = t == p, f == p
+    _place(
+        m,
+        np.concatenate([d[to_pivot], d[from_pivot]]),
+        np.concatenate([f[to_pivot], t[from_pivot]]),
+        np.concatenate([v[to_pivot], 1.0 / v[from_pivot]]),
+    )
+    while True:
+        down = ~np.isnan(m[d, t]) & np.isnan(m[d, f])
+        up = ~np.isnan(m[d, f]) & np.isnan(m[d, t])
+        if not (down.any() or up.any()):
+            break
+        rows = np.concatenate([np.flatnonzero(down), np.flatnonzero(up)])
+        order = np.argsort(rows, kind="stable")  # candidates in SAP row order
+        _place(
+            m,
+            d[rows][order],
+            np.concatenate([f[down], t[up]])[order],
+            np.concatenate([v[down] * m[d[down], t[down]], m[d[up], f[up]] / v[up]])[order],
+        )
+    return dates, currencies, m
+
+
+def pivot_mismatches(long: pd.DataFrame, pivot: str = "USD", rtol: float = 1e-9) -> pd.DataFrame:
+    """
+    SAP quotes against the pivot (either way round) that the currency matrix does not reproduce:
+    the matrix must hold Rate (X per pivot) or 1 / Rate (pivot per X) for every such quote.
+    Lines left over are days where SAP's two directions disagree; the matrix keeps X per pivot.
+    """
+    pivot = pivot.upper()
+    dates, currencies, m = currency_matrix(long, pivot)
+    quotes = long[long["From"].ne(long["To"]) & long["Rate"].gt(0) & (long["From"].eq(pivot) | long["To"].eq(pivot))]
+    quotes = quotes.sort_values("row", kind="mergesort").drop_duplicates(["Date", "From", "To"], keep="last")
+
+    other = np.where(quotes["To"].eq(pivot), quotes["From"], quotes["To"]).astype(object)
+    rate = quotes["Rate"].to_numpy(dtype=float)
+    expected = np.where(quotes["To"].eq(pivot), rate, 1.0 / rate)
+    held = m[np.searchsorted(dates, quotes["Date"].to_numpy(dtype=object)), np.searchsorted(currencies, other)]
+
+    out = quotes.drop(columns="row").assign(Expected=expected, Matrix=held)
+    return out[~np.isclose(held, expected, rtol=rtol, atol=0)].reset_index(drop=True)
+
+
+def triangulated_rates(long: pd.DataFrame, target: str, currency_meta: dict, pivot: str = "USD",
+                       rate_col: str = "Rates/Company Rate") -> pd.DataFrame:
+    """
+    consolidation_rates for any target currency. Where SAP has the exact (currency, target) row
+    that day its rate is used; otherwise the rate is derived from the currency matrix as
+    matrix[currency] / matrix[target]. Derived is True on the rows that were computed.
+    """
+    target = target.upper()
+    direct = consolidation_rates(long, target, currency_meta, rate_col).assign(Derived=False)
+    dates, currencies, m = currency_matrix(long, pivot)
+    if target not in set(currencies):
+        return direct
+
+    wanted = np.array([c for c in currency_meta if c != target and c in set(currencies)], dtype=object)
+    cross = m[:, np.searchsorted(currencies, wanted)] / m[:, [np.searchsorted(currencies, target)]]
+    di, ci = np.nonzero(~np.isnan(cross))
+    derived = pd.DataFrame({
+        "Rates/Date": dates[di],
+        rate_col: cross[di, ci],
+        "Rates/Currency": wanted[ci],
+        "Derived": True,
+    })
+    quoted = pd.MultiIndex.from_frame(direct[["Rates/Date", "Rates/Currency"]])
+    derived = derived[~pd.MultiIndex.from_frame(derived[["Rates/Date", "Rates/Currency"]]).isin(quoted)]
+
+    out = pd.concat([direct, derived], ignore_index=True)
+    return out.sort_values(by=["Rates/Currency", "Rates/Date"], ascending=[True, False]).reset_index(drop=True)
+
+
+def add_currency_headers(out: pd.DataFrame, currency_meta: dict, id_col: str = "External ID",
+                         currency_col: str = "Rates/Currency") -> pd.DataFrame:
+    """Fill id / Symbol / Active on the first row of each currency block (out must be sorted by currency)."""
+    out = out.copy()
+    first = ~out[currency_col].duplicated().to_numpy()
+    meta = [currency_meta[c] for c in out.loc[first, currency_col].astype(str)]
+    out[id_col] = ""
+    out["Symbol"] = ""
+    out["Active"] = ""
+    out.loc[first, id_col] = [m[0] for m in meta]
+    out.loc[first, "Symbol"] = [m[1] for m in meta]
+    out.loc[first, "Active"] = "TRUE"
+    return out
+
+
+def rate_anomalies(df: pd.DataFrame, date_cols: list, window: int = 21, z_limit: float = 8.0,
+                   min_move: float = 0.10, jump: float = 0.25, stuck_days: int = 20) -> pd.DataFrame:
+    """
+    Suspicious SAP rates, one line per flagged (SAP row, date). date_cols must be oldest first.
+    All series are checked at once on a date x series array of log rates:
+
+      outlier   more than z_limit robust deviations and min_move away from the rolling median
+                of the previous window quotes, and as far from the next quote and from the
+                median of the next window quotes (scale: rolling median of day-over-day moves);
+                a lasting level shift is reported once, as a jump, not as an outlier on every
+                day of the new level. The latest quotes, with too few quotes after them, are
+                judged on the previous ones only
+      jump      more than jump (relative) away from the previous quote
+      inverted  closer to 1 / rolling median than to the rolling median itself
+      stuck     unchanged for stuck_days quotes in a series that normally moves (pegs are skipped)
+      invalid   zero or negative rate
+
+    Reference is the rolling median (outlier, inverted) or the previous quote (jump, stuck);
+    Score is the robust z-score, the log move (jump) or the number of unchanged quotes (stuck).
+    """
+    values = df[date_cols].to_numpy(dtype=float).T  # dates x SAP rows
+    invalid = values <= 0
+    logs = pd.DataFrame(np.log(np.where(invalid, np.nan, values)))
+    observed = logs.notna().to_numpy()
+
+    prev = logs.ffill().shift(1)
+    step = logs - prev
+    min_periods = max(5, window // 3)
+    median = logs.rolling(window, min_periods=min_periods).median().shift(1)
+    scale = step.abs().rolling(window, min_periods=min_periods).median().shift(1)
+    dev = logs - median
+    z = dev / (1.4826 * scale.clip(lower=1e-4))
+
+    def far(reference):
+        gap = logs - reference
+        return (gap.abs() / (1.4826 * scale.clip(lower=1e-4)) > z_limit) & (gap.abs() > np.log1p(min_move))
+
+    # a fat-finger stands apart from what came before and from what follows; a new level does not
+    ahead = logs.iloc[::-1].rolling(window, min_periods=min_periods).median().shift(1).iloc[::-1]
+    following = logs.bfill().shift(-1)
+    outlier = far(median) & (ahead.isna() | (far(ahead) & far(following)))
+    jumped = step.abs() > np.log1p(jump)
+    inverted = ((logs + median).abs() < dev.abs()) & (median.abs() > np.log(2))
+
+    # stuck: quotes equal to the previous quote, counted since the last change (gaps do not reset)
+    same = (step == 0).to_numpy()
+    count = np.cumsum(same, axis=0)
+    reset = np.where(observed & ~same, count, 0)
+    run = count - np.maximum.accumulate(reset, axis=0)
+    moving = same.sum(axis=0) < 0.5 * np.maximum(observed.sum(axis=0), 1)  # pegged series repeat most days
+    stuck = (run == stuck_days) & same & moving
+
+    checks = [
+        ("invalid", invalid, values, np.full(values.shape, np.nan)),
+        ("inverted", inverted.to_numpy(), np.exp(median.to_numpy()), z.to_numpy()),
+        ("outlier", outlier.to_numpy() & ~inverted.to_numpy(), np.exp(median.to_numpy()), z.to_numpy()),
+        ("jump", jumped.to_numpy(), np.exp(prev.to_numpy()), step.to_numpy()),
+        ("stuck", stuck, np.exp(prev.to_numpy()), run.astype(float)),
+    ]
+    keys = pd.DataFrame({
+        "Country": df[COUNTRY_COL].astype(str).str.strip().to_numpy() if COUNTRY_COL in df else "",
+        "From": df[FROM_COL].astype(str).str.strip().str.upper().to_numpy() if FROM_COL in df else "",
+        "To": df[TO_COL].astype(str).str.strip().str.upper().to_numpy() if TO_COL in df else "",
+    })
+    iso = pd.to_datetime(pd.Index(date_cols), format=DATE_FORMAT).strftime("%Y-%m-%d").to_numpy()
+
+    found = []
+    for name, flags, reference, score in checks:
+        d, r = np.nonzero(flags)
+        hit = keys.iloc[r].reset_index(drop=True)
+        hit.insert(0, "row", r)
+        hit["Date"] = iso[d]
+        hit["Rate"] = values[d, r]
+        hit["Check"] = name
+        hit["Reference"] = reference[d, r]
+        hit["Score"] = score[d, r]
+        found.append(hit)
+    report = pd.concat(found, ignore_index=True)
+    return report.sort_values(["row", "Date"], kind="mergesort").drop(columns="row").reset_index(drop=True)
+
+
+def load_watermarks(path) -> dict:
+    """Last exported Rates/Date per output file, currency and company: {output: {currency: {company: date}}}."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_watermarks(path, watermarks: dict):
+    tmp = str(path) + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(watermarks, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def select_new_rates(out: pd.DataFrame, marks: dict, currency_col: str = "Rates/Currency",
+                     company_col: str = "Rates/Company", date_col: str = "Rates/Date"):
+    """
+    Keep only rates dated after the watermark of their (currency, company); pairs without a
+    watermark are exported in full. Files without a company column use "" as the company.
+    Returns (those rows, watermarks moved up to the newest date in out).
+    """
+    company = out[company_col] if company_col in out else pd.Series("", index=out.index)
+    key = out[currency_col].astype(str) + "|" + company.astype(str)
+    flat = {f"{cur}|{co}": d for cur, by_company in marks.items() for co, d in by_company.items()}
+    dates = out[date_col].astype(str)
+    mark = key.map(flat)
+    new = out[(mark.isna() | dates.gt(mark.fillna(""))).to_numpy()].reset_index(drop=True)
+
+    advanced = {cur: dict(by_company) for cur, by_company in marks.items()}
+    latest = dates.groupby([out[currency_col].astype(str), company.astype(str)], sort=False).max()
+    for (cur, co), d in latest.items():
+        by_company = advanced.setdefault(cur, {})
+        if d > by_company.get(co, ""):
+            by_company[co] = d
+    return new, advanced
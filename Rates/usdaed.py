@@ -1,6 +1,23 @@
-import pandas as pd
-from datetime import datetime
-import re
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # shared helpers at the repo root
+from rates import (
+    add_currency_headers,
+    company_rates,
+    consolidation_rates,
+    load_watermarks,
+    melt_rates,
+    pivot_mismatches,
+    rate_anomalies,
+    read_rate_matrix,
+    require_columns,
+    round_rates,
+    save_watermarks,
+    select_new_rates,
+    triangulated_rates,
+)
+from xlwriter import StreamingSheetWriter
 
 INPUT_FILE = "sap_rates_today.xlsx"
 
@@ -10,8 +27,18 @@ OUT_AED_CONS = "odoo_rates_consolidation_AED.xlsx"   # NEW
 
 DATE_FROM = "04.01.2016"
 DATE_TO   = "08.12.2025"
-date_from_dt = datetime.strptime(DATE_FROM, "%d.%m.%Y")
-date_to_dt   = datetime.strptime(DATE_TO, "%d.%m.%Y")
+
+# Incremental publishing: each file gets only rates newer than its last exported date per (currency, company)
+INCREMENTAL = False
+STATE_FILE = "odoo_rates_state.json"
+
+# Consolidation pairs SAP does not quote directly are derived through PIVOT_CURRENCY
+# (listed on a "Derived" sheet next to "Rates"); False keeps only SAP's own rows
+TRIANGULATE = False
+PIVOT_CURRENCY = "USD"
+
+# Fat-finger check over the whole history before export ("" to skip)
+ANOMALY_FILE = "rate_anomalies.xlsx"
 
 CURRENCY_META = {
     "AED": ("base.AED", "AED"),
@@ -63,181 +90,133 @@ COUNTRY_TO_COMPANIES = {
     "Saudi Arabia": ["SA10"],
 }
 
-def clean_cell(val):
-    if isinstance(val, str):
-        return val.replace("\xa0", " ").strip()
-    return val
-
-def add_currency_headers_grouped(df_out, currency_col="Rates/Currency"):
-    """Sort by currency then date desc; add id/symbol/active only on first row of each currency block."""
-    df_out = df_out.sort_values(
-        by=[currency_col, "Rates/Date", "Rates/Currency"],
-        ascending=[True, False, True]
-    ).reset_index(drop=True)
-
-    df_out["id"] = ""
-    df_out["Symbol"] = ""
-    df_out["Active"] = ""
-
-    for cur, (ext_id, sym) in CURRENCY_META.items():
-        idx = df_out.index[df_out[currency_col] == cur]
-        if len(idx) == 0:
-            continue
-        first_idx = idx[0]
-        df_out.at[first_idx, "id"] = ext_id
-        df_out.at[first_idx, "Symbol"] = sym
-        df_out.at[first_idx, "Active"] = "TRUE"
-
-    return df_out
-
 # ─────── Read normalized file ────────────────────────────────
-df = pd.read_excel(INPUT_FILE)
-df.columns = [str(c).strip() for c in df.columns]
-
-for i in range(df.shape[1]):
-    if df.iloc[:, i].dtype == object:
-        df.iloc[:, i] = df.iloc[:, i].apply(clean_cell)
+df, date_cols = read_rate_matrix(INPUT_FILE, DATE_FROM, DATE_TO)
 
 country_col = "Country"
 from_col = "From Currency"
 to_col = "To currency"
 
-for req in (country_col, from_col, to_col):
-    if req not in df.columns:
-        raise ValueError(f"Missing column '{req}'. Found: {list(df.columns)[:30]} ...")
-
-date_cols_all = [c for c in df.columns if re.fullmatch(r"\d{2}\.\d{2}\.\d{4}", str(c))]
-
-date_cols = []
-for c in date_cols_all:
-    dt = datetime.strptime(c, "%d.%m.%Y")
-    if date_from_dt <= dt <= date_to_dt:
-        date_cols.append(c)
-
-if not date_cols:
-    raise ValueError(
-        f"No date columns matched {DATE_FROM} to {DATE_TO}. "
-        f"Found date columns like: {date_cols_all[:5]}"
-    )
-
-date_cols = sorted(date_cols, key=lambda x: datetime.strptime(x, "%d.%m.%Y"))
-date_cols_desc = list(reversed(date_cols))
-iso_map = {c: datetime.strptime(c, "%d.%m.%Y").strftime("%Y-%m-%d") for c in date_cols}
-
-# ─────── 1) Build PER-COMPANY output (what you already have) ──
-company_rows = []
-for _, r in df.iterrows():
-    sap_country = str(r.get(country_col, "")).strip()
-    to_cur = str(r.get(to_col, "")).strip().upper()
-    if not sap_country or not to_cur or to_cur not in CURRENCY_META:
-        continue
-
-    companies = COUNTRY_TO_COMPANIES.get(sap_country)
-    if not companies:
-        continue
-
-    for dcol in date_cols_desc:
-        rate = r.get(dcol)
-        if pd.isna(rate):
-            continue
-
-        iso_date = iso_map[dcol]
-
-        for company in companies:
-            company_rows.append({
-                "Rates/Date": iso_date,
-                "Rates/Inverse Company Rate": round(float(rate), 2),
-                "Rates/Currency": to_cur,
-                "Rates/Company": company,
-            })
-
-out_company = pd.DataFrame(company_rows).drop_duplicates(
-    subset=["Rates/Date", "Rates/Currency", "Rates/Company"],
-    keep="last"
-)
+require_columns(df, country_col, from_col, to_col)
+
+# ─────── Flag suspicious SAP rates (jumps, inversions, stuck values) ──
+if ANOMALY_FILE:
+    anomalies = rate_anomalies(df, date_cols)
+    anomalies.to_excel(ANOMALY_FILE, index=False, sheet_name="Flagged rates")
+    counts = ", ".join(f"{n} {check}" for check, n in anomalies["Check"].value_counts().items())
+    print(f"⚠️ {len(anomalies)} flagged rate(s) ({counts or 'none'}), see '{ANOMALY_FILE}'")
+
+# ─────── Reshape the SAP matrix ONCE ─────────────────────────
+# Every export below is a filter / join / rounding of this one long table
+long = melt_rates(df, date_cols)
+rounded = {}
+
+# Derived rates must agree with SAP's own quotes against the pivot (either way round)
+if TRIANGULATE:
+    mismatches = pivot_mismatches(long, PIVOT_CURRENCY)
+    if not mismatches.empty:
+        print(f"⚠️ {len(mismatches)} SAP {PIVOT_CURRENCY} quote(s) not matched by the derived rates "
+              f"(both directions quoted and disagreeing), e.g.:\n{mismatches.head().to_string(index=False)}")
+
+
+def long_rounded(ndigits):
+    if ndigits is None:
+        return long
+    if ndigits not in rounded:
+        rounded[ndigits] = long.assign(Rate=round_rates(long["Rate"], ndigits))
+    return rounded[ndigits]
+
+
+state = load_watermarks(STATE_FILE) if INCREMENTAL else {}
+
+
+def only_new(out, path):
+    if not INCREMENTAL:
+        return out
+    out, state[path] = select_new_rates(out, state.get(path, {}))
+    return out
+
+
+def write_rates(out, path, derived=None, block=50_000):
+    # categorical columns are decoded to text one block of rows at a time, as they are written
+    with StreamingSheetWriter(path) as writer:
+        writer.add_sheet("Rates", out.columns)
+        for start in range(0, len(out), block):
+            writer.write_frame(out.iloc[start:start + block])
+        if derived is not None and not derived.empty:
+            writer.add_sheet("Derived", derived.columns)
+            writer.write_frame(derived)
+
+
+# ─────── 1) PER-COMPANY output (what you already have) ───────
+def build_company_file(out_path: str, ndigits=2):
+    out_company = company_rates(long_rounded(ndigits), COUNTRY_TO_COMPANIES, CURRENCY_META)
+    out_company = only_new(out_company, out_path)
+    if INCREMENTAL and out_company.empty:
+        print(f"ℹ️ No rates newer than the last export for {out_path}, not written.")
+        return
+    out_company = add_currency_headers(out_company, CURRENCY_META, id_col="External ID")
+    out_company = out_company[[
+        "External ID", "Symbol", "Active",
+        "Rates/Date", "Rates/Inverse Company Rate",
+        "Rates/Currency", "Rates/Company"
+    ]]
+    write_rates(out_company, out_path)
+    print(f"✅ Per-company file saved: {out_path}")
 
-# add headers by currency block
-out_company = out_company.sort_values(
-    by=["Rates/Currency", "Rates/Date", "Rates/Company"],
-    ascending=[True, False, True]
-).reset_index(drop=True)
-out_company["External ID"] = ""
-out_company["Symbol"] = ""
-out_company["Active"] = ""
-
-for cur, (ext_id, sym) in CURRENCY_META.items():
-    idx = out_company.index[out_company["Rates/Currency"] == cur]
-    if len(idx) == 0:
-        continue
-    first_idx = idx[0]
-    out_company.at[first_idx, "External ID"] = ext_id
-    out_company.at[first_idx, "Symbol"] = sym
-    out_company.at[first_idx, "Active"] = "TRUE"
-
-out_company = out_company[[
-    "External ID", "Symbol", "Active",
-    "Rates/Date", "Rates/Inverse Company Rate",
-    "Rates/Currency", "Rates/Company"
-]]
-
-# ─────── 2) Build CONSOLIDATION outputs (USD + AED) ──────────
-def build_consolidation_file(target_to_currency: str, out_path: str):
+
+# ─────── 2) CONSOLIDATION outputs (USD + AED) ────────────────
+def build_consolidation_file(target_to_currency: str, out_path: str, ndigits=2):
     """
-    Consolidation file: only rows where To currency == target_to_currency.
+    Consolidation file: only rows where To currency == target_to_currency
+    (plus pairs derived through PIVOT_CURRENCY when TRIANGULATE is on).
     Columns: id, Symbol, Active, Rates/Date, Rates/Company Rate, Rates/Currency
     """
-    target_to_currency = target_to_currency.upper()
-
-    cons_rows = []
-    for _, r in df.iterrows():
-        to_cur = str(r.get(to_col, "")).strip().upper()
-        from_cur = str(r.get(from_col, "")).strip().upper()
-
-        # We only want "all vs USD" or "all vs AED"
-        if to_cur != target_to_currency:
-            continue
-
-        # From currency becomes the "Rates/Currency" we are defining rates for
-        if not from_cur or from_cur not in CURRENCY_META:
-            continue
-
-        for dcol in date_cols_desc:
-            rate = r.get(dcol)
-            if pd.isna(rate):
-                continue
-
-            cons_rows.append({
-                "Rates/Date": iso_map[dcol],
-                "Rates/Company Rate": round(float(rate), 2),
-                "Rates/Currency": from_cur,
-            })
-
-    out_cons = pd.DataFrame(cons_rows)
-
-    # remove duplicates per day+currency (no company column here)
-    out_cons = out_cons.drop_duplicates(
-        subset=["Rates/Date", "Rates/Currency"],
-        keep="last"
-    )
+    derived = None
+    if TRIANGULATE:
+        # cross rates come from the unrounded SAP values, rounded once at the end
+        out_cons = triangulated_rates(long, target_to_currency, CURRENCY_META, PIVOT_CURRENCY)
+        if ndigits is not None:
+            out_cons["Rates/Company Rate"] = round_rates(out_cons["Rates/Company Rate"], ndigits)
+    else:
+        out_cons = consolidation_rates(long_rounded(ndigits), target_to_currency, CURRENCY_META)
+    out_cons = only_new(out_cons, out_path)
+    if INCREMENTAL and out_cons.empty:
+        print(f"ℹ️ No rates newer than the last export for {out_path}, not written.")
+        return
+
+    if TRIANGULATE:
+        derived = out_cons.loc[out_cons["Derived"], ["Rates/Date", "Rates/Company Rate", "Rates/Currency"]]
+        print(f"ℹ️ {len(derived)} {target_to_currency.upper()} rate(s) derived from other SAP quotes (pivot {PIVOT_CURRENCY})")
 
     # group by currency + add headers at top of each currency block
-    out_cons = add_currency_headers_grouped(out_cons, currency_col="Rates/Currency")
+    out_cons = add_currency_headers(out_cons, CURRENCY_META, id_col="id")
 
     out_cons = out_cons[[
         "id", "Symbol", "Active",
         "Rates/Date", "Rates/Company Rate",
         "Rates/Currency"
     ]]
-
-    with pd.ExcelWriter(out_path, engine="openpyxl") as writer:
-        out_cons.to_excel(writer, index=False, sheet_name="Rates")
-
-    print(f"✅ Consolidation {target_to_currency} saved: {out_path}")
-
-# Write files
-with pd.ExcelWriter(OUT_COMPANY, engine="openpyxl") as writer:
-    out_company.to_excel(writer, index=False, sheet_name="Rates")
-print(f"✅ Per-company file saved: {OUT_COMPANY}")
-
-build_consolidation_file("USD", OUT_USD_CONS)
-build_consolidation_file("AED", OUT_AED_CONS)
+    write_rates(out_cons, out_path, derived)
+    print(f"✅ Consolidation {target_to_currency.upper()} saved: {out_path}")
+
+
+# Write files: (target, output file, decimals); target None = per-company file.
+# Add a line here for another consolidation currency or precision, no extra pass over the matrix
+# (with TRIANGULATE on, any currency works as a target, e.g. ("KES", "odoo_rates_consolidation_KES.xlsx", 2)).
+EXPORTS = [
+    (None, OUT_COMPANY, 2),
+    ("USD", OUT_USD_CONS, 2),
+    ("AED", OUT_AED_CONS, 2),
+]
+
+for target, out_path, ndigits in EXPORTS:
+    if target is None:
+        build_company_file(out_path, ndigits)
+    else:
+        build_consolidation_file(target, out_path, ndigits)
+
+# Only move the watermarks forward once every file is written
+if INCREMENTAL:
+    save_watermarks(STATE_FILE, state)
+    print(f"ℹ️ Watermarks saved to '{STATE_FILE}'.")
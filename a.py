@@ -1,3 +1,5 @@
+import re
+
 import pandas as pd
 
 # Load the Excel file
@@ -24,15 +26,20 @@ replacements = {
     "TECHNO BRAIN GROUP": "TBG"
 }
 
-# Replace in 'company_ids' column only
+# One pass per cell: every country name is matched in a single alternation, longest names
+# first, so a name inside a longer one (or inside a code already written) is never rewritten
+country_pattern = re.compile("|".join(re.escape(c) for c in sorted(replacements, key=len, reverse=True)))
+
+
 def update_company_ids(value):
-    if pd.isna(value):
+    if not isinstance(value, str):
         return value
-    for country, code in replacements.items():
-        value = value.replace(country, code)
-    return value
+    return country_pattern.sub(lambda m: replacements[m.group(0)], value)
+
 
-df["company_ids"] = df["company_ids"].apply(update_company_ids)
+# Replace in 'company_ids' column only, once per distinct value
+distinct = df["company_ids"].dropna().unique()
+df["company_ids"] = df["company_ids"].map({v: update_company_ids(v) for v in distinct})
 
 # Save to a new Excel file
 df.to_excel("3.xlsx", index=False)
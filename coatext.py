@@ -0,0 +1,68 @@
+import os
+import re
+
+import pandas as pd
+from openpyxl import load_workbook
+
+# A COA line: a 10-digit account code, optionally followed by its description
+# ("1010000000 Share Capital by Holding Company")
+CODE_LINE = re.compile(r"^\s*(?P<code>\d{10})(?:\s+(?P<description>.*?))?\s*$")
+
+
+def iter_lines(path, sheet=None):
+    """
+    (line number, text) for every non-empty line of a raw single-column COA dump, read as a
+    stream: the first column of an .xlsx sheet (read-only, row by row) or each line of a text
+    export. Numbers are written as integers where they are whole (1010000000.0 -> "1010000000").
+    """
+    if os.path.splitext(str(path))[1].lower() in (".xlsx", ".xlsm"):
+        wb = load_workbook(path, read_only=True, data_only=True)
+        try:
+            ws = wb[sheet] if sheet is not None else wb.worksheets[0]
+            for number, (value,) in enumerate(ws.iter_rows(max_col=1, values_only=True), start=1):
+                if value is None:
+                    continue
+                if isinstance(value, float) and value.is_integer():
+                    value = int(value)
+                yield number, str(value)
+        finally:
+            wb.close()
+    else:
+        with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+            for number, line in enumerate(f, start=1):
+                line = line.rstrip("\r\n")
+                if line.strip():
+                    yield number, line
+
+
+def extract_codes(lines):
+    """
+    Split (line number, text) pairs into codes and descriptions with one match per line.
+    Returns (DataFrame of code / description, DataFrame of the unmatched line / text).
+    """
+    codes, descriptions, unmatched = [], [], []
+    match = CODE_LINE.match
+    for number, text in lines:
+        m = match(text)
+        if m is None:
+            unmatched.append((number, text))
+            continue
+        codes.append(m["code"])
+        descriptions.append(m["description"] or "")
+    return (
+        pd.DataFrame({"code": codes, "description": descriptions}),
+        pd.DataFrame(unmatched, columns=["line", "text"]),
+    )
+
+
+def read_code_lines(path, sheet=None):
+    """extract_codes() straight from a COA dump file."""
+    return extract_codes(iter_lines(path, sheet))
+
+
+def report_unmatched(unmatched: pd.DataFrame, path):
+    """Save the lines without a code for review, if there are any."""
+    if unmatched.empty:
+        return
+    unmatched.to_excel(path, index=False)
+    print(f"⚠️ {len(unmatched)} line(s) without a 10-digit code, see '{path}'")
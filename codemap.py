@@ -0,0 +1,94 @@
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from xlcache import read_excel_cached
+
+# -------------------------------
+# Settings (python codemap.py fills every category in one run)
+# -------------------------------
+ROOT = Path(__file__).resolve().parent
+CATEGORIES = {  # category -> (code mapping export, output), relative to the repo root
+    "Assets": ("Assets/5.xlsx", "Assets/code_mapping_with_company_ids.xlsx"),
+    "Expense": ("Expense/map.xlsx", "Expense/code_mapping_with_company_ids.xlsx"),
+    "Interco": ("Interco/map.xlsx", "Interco/code_mapping_with_company_ids.xlsx"),
+    "income": ("income/map.xlsx", "income/code_mapping_with_company_ids.xlsx"),
+    "Liabilities": ("Liabilities/liability.xlsx", "Liabilities/code_mapping_with_company_ids.xlsx"),
+}
+WORKERS = 4  # categories filled side by side; 0 or 1 runs them one after the other
+
+CODE_COL = "code_mapping_ids/code"
+COMPANY_COL = "code_mapping_ids/company_id"
+TBG = "TBG"
+
+
+def fill_company_ids(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Fill the code down, then give every TBG row the comma-joined company ids of all rows with its
+    code (in sheet order, TBG included) in a new company_ids column; other rows get "".
+    One factorize and one grouped join over the sheet, whatever the number of codes.
+    """
+    df = df.copy()
+    df[CODE_COL] = df[CODE_COL].replace("", np.nan).ffill()
+
+    codes, _ = pd.factorize(df[CODE_COL])  # -1 before the first code
+    company = df[COMPANY_COL]
+    named = (codes >= 0) & company.notna().to_numpy()
+    joined = company[named].astype(str).groupby(codes[named], sort=False).agg(",".join)
+
+    lists = np.full(codes.max() + 1 if len(codes) else 0, "", dtype=object)
+    lists[joined.index.to_numpy()] = joined.to_numpy()
+    tbg = company.eq(TBG).to_numpy() & (codes >= 0)
+
+    company_ids = np.full(len(df), "", dtype=object)
+    company_ids[tbg] = lists[codes[tbg]]
+    df["company_ids"] = company_ids
+    return df
+
+
+def fill_company_ids_file(input_file, output_file) -> pd.DataFrame:
+    df = fill_company_ids(read_excel_cached(input_file))
+    df.to_excel(output_file, index=False)
+    return df
+
+
+def _fill_category(job):
+    name, df, output_file = job
+    out = fill_company_ids(df)
+    out.to_excel(output_file, index=False)
+    return name, len(out), int(out["company_ids"].ne("").sum())
+
+
+def run_categories(categories: dict, workers: int = WORKERS, root=ROOT) -> list:
+    """
+    Fill every category in one run. Each input workbook is parsed once, even when several
+    categories point at it; categories are filled and written on a process pool when workers > 1.
+    Returns (category, rows, TBG rows filled) per category, in the order given.
+    """
+    parsed = {}
+    jobs = []
+    for name, (input_file, output_file) in categories.items():
+        src = os.path.join(root, input_file)
+        if src not in parsed:
+            parsed[src] = read_excel_cached(src)
+        jobs.append((name, parsed[src], os.path.join(root, output_file)))
+
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            return list(pool.map(_fill_category, jobs))
+    return [_fill_category(job) for job in jobs]
+
+
+def main():
+    names = sys.argv[1:] or list(CATEGORIES)  # e.g. python codemap.py Assets income
+    for name, rows, filled in run_categories({n: CATEGORIES[n] for n in names}):
+        output_file = CATEGORIES[name][1]
+        print(f"✅ {name}: {filled} TBG row(s) filled out of {rows}, saved '{output_file}'")
+
+
+if __name__ == "__main__":
+    main()
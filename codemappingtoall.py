@@ -1,46 +1,98 @@
+import numpy as np
 import pandas as pd
 
-# Load your Excel file
-df = pd.read_excel("banks.xlsx")
+# Settings
+INPUT_FILE = "banks.xlsx"
+OUTPUT_FILE = "banks_final_tbg_only_codes_and_companies.xlsx"
+ISSUES_FILE = "banks_block_issues.xlsx"  # blocks with an unexpected size, no code or several codes
+BLOCK_SIZE = 35  # expected rows per account (TBG + one per company); only used to validate
 
-# Step 1: Extract all non-empty codes in order
-codes_in_order = df["code_mapping_ids/code"].dropna().astype(str).tolist()
+CODE_COL = "code_mapping_ids/code"
+COMPANY_COL = "code_mapping_ids/company_id"
 
-# Step 2: Repeat each code 35 times
-expanded_codes = []
-for code in codes_in_order:
-    expanded_codes.extend([code] * 35)
-
-# Step 3: Apply expanded codes back into the dataframe
-df["code_mapping_ids/code"] = expanded_codes[:len(df)]
-
-# Step 4: Define the constant company list
-company_list = (
+# Order of companies in company_ids; companies not listed here follow in sheet order
+COMPANY_ORDER = (
     "KE10,KE20,KE30,KE40,KE50,"
     "MU10,MU20,MU30,MU40,MU50,"
     "MW10,MZ10,NA10,NG10,RW10,SZ10,TZ10,"
     "UG10,UG20,US10,ZA10,ZA20,ZM10,"
     "TBG,AE00,AE10,AE20,BR10,CA10,ET10,GB10,GH10,IN10,IN20,IN30"
-)
+).split(",")
+
+
+def expand_blocks(df: pd.DataFrame, block_size: int = BLOCK_SIZE):
+    """
+    Every account is a block of rows starting at its TBG row. The block's code (wherever it sits
+    in the block) is copied to all its rows, and the TBG row gets the code and the block's own
+    companies in "code" / "company_ids". Returns (expanded frame, one line per suspicious block).
+    """
+    df = df.copy()
+    company = df[COMPANY_COL].astype(str).str.strip()
+    block = np.cumsum(company.eq("TBG").to_numpy()) - 1  # -1 before the first TBG row
+    in_block = block >= 0
+    blocks = block.max() + 1 if len(block) else 0
+
+    # the code of each block: first code found in it, and how many distinct codes there were
+    has_code = in_block & df[CODE_COL].notna().to_numpy()
+    codes = df.loc[has_code, CODE_COL].astype(str)
+    per_block = codes.groupby(block[has_code])
+    block_code = np.full(blocks, "", dtype=object)
+    block_code[per_block.first().index.to_numpy()] = per_block.first().to_numpy()
+    distinct = np.zeros(blocks, dtype=int)
+    distinct[per_block.nunique().index.to_numpy()] = per_block.nunique().to_numpy()
+
+    # the companies of each block, in COMPANY_ORDER
+    rank = pd.Series(company.map({c: i for i, c in enumerate(COMPANY_ORDER)}).to_numpy(), dtype=float)
+    rank = rank.fillna(len(COMPANY_ORDER) + pd.Series(np.arange(len(df)), dtype=float)).to_numpy()
+    named = in_block & df[COMPANY_COL].notna().to_numpy()
+    order = np.lexsort((rank[named], block[named]))
+    members = company[named].iloc[order]
+    block_companies = np.full(blocks, "", dtype=object)
+    joined = members.groupby(block[named][order], sort=False).agg(",".join)
+    block_companies[joined.index.to_numpy()] = joined.to_numpy()
+
+    expanded = df[CODE_COL].astype(object).to_numpy(copy=True)
+    expanded[in_block] = block_code[block[in_block]]
+    df[CODE_COL] = expanded
+
+    tbg = in_block & company.eq("TBG").to_numpy()
+    df["company_ids"] = ""
+    df["code"] = ""
+    df.loc[tbg, "company_ids"] = block_companies[block[tbg]]
+    df.loc[tbg, "code"] = block_code[block[tbg]]
+
+    # validation: one line per block that does not look like a complete account
+    sizes = np.bincount(block[in_block], minlength=blocks)
+    dupes = np.zeros(blocks, dtype=int)
+    counted = pd.DataFrame({"block": block[named], "company": company[named].to_numpy()})
+    repeated = counted[counted.duplicated()].groupby("block").size()
+    dupes[repeated.index.to_numpy()] = repeated.to_numpy()
 
-# Step 5: Initialize empty columns
-df["company_ids"] = ""
-df["code"] = ""
+    first_row = np.flatnonzero(tbg)
+    report = pd.DataFrame({
+        "Excel row": first_row + 2,
+        "name": df["name"].to_numpy()[first_row] if "name" in df else "",
+        "code": block_code,
+        "rows": sizes,
+        "codes found": distinct,
+        "repeated companies": dupes,
+    })
+    problems = np.select(
+        [distinct == 0, distinct > 1, dupes > 0, sizes != block_size],
+        ["no code", "several codes", "company listed twice", f"not {block_size} rows"],
+        default="",
+    )
+    report["problem"] = problems
+    return df, report[report["problem"].ne("")].reset_index(drop=True)
 
-# Step 6: Fill only rows where company_id == "TBG"
-block_size = 35
-for start in range(0, len(df), block_size):
-    end = start + block_size
-    block_code = df["code_mapping_ids/code"].iloc[start]  # same repeated code for the block
 
-    mask_tbg = (df.index >= start) & (df.index < end) & (df["code_mapping_ids/company_id"] == "TBG")
+df = pd.read_excel(INPUT_FILE)
+df, issues = expand_blocks(df)
 
-    # Fill company_ids and code only for TBG row
-    df.loc[mask_tbg, "company_ids"] = company_list
-    df.loc[mask_tbg, "code"] = block_code
+df.to_excel(OUTPUT_FILE, index=False)
 
-# Step 7: Save the result
-output_file = "banks_final_tbg_only_codes_and_companies.xlsx"
-df.to_excel(output_file, index=False)
+if not issues.empty:
+    issues.to_excel(ISSUES_FILE, index=False)
+    print(f"⚠️ {len(issues)} block(s) need a look, see '{ISSUES_FILE}'")
 
 print("✅ Done! Code and company_ids added only where company_id == 'TBG'.")
@@ -1,14 +1,15 @@
-import pandas as pd
-import re
+import sys
+from pathlib import Path
 
-# Load the Excel file
-df = pd.read_excel("y.xlsx", header=None)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # shared helpers at the repo root
+from coatext import read_code_lines, report_unmatched
 
-# Extract code and name from the first column using regex
-df[['code', 'name']] = df[0].str.extract(r'^(\d{10})\s+(.*)')
+# Load the Excel file and extract code and name from the first column
+df, unmatched = read_code_lines("y.xlsx")
+df = df.rename(columns={"description": "name"})
 
-# Drop original column 0
-df = df[['code', 'name']]
+# Lines without a 10-digit code (the header row, blank or stray lines) are listed separately
+report_unmatched(unmatched, "cleaned_output_unmatched.xlsx")
 
 # Save to new file
 df.to_excel("cleaned_output.xlsx", index=False)
@@ -1,22 +1,15 @@
-import pandas as pd
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # shared helpers at the repo root
+from codemap import fill_company_ids_file
 
 # Load your input Excel file
 input_file = "map.xlsx"
-df = pd.read_excel(input_file)
-
-# Step 1: Fill down the code column
-df["code_mapping_ids/code"] = df["code_mapping_ids/code"].replace("", pd.NA).fillna(method="ffill")
-
-# Step 2: Group by the filled code to get corresponding company_ids
-company_group = df.groupby("code_mapping_ids/code")["code_mapping_ids/company_id"].apply(lambda x: ",".join(x))
-
-# Step 3: Create new column 'company_ids' only for TBG rows
-df["company_ids"] = ""
-for code, company_list in company_group.items():
-    mask = (df["code_mapping_ids/code"] == code) & (df["code_mapping_ids/company_id"] == "TBG")
-    df.loc[mask, "company_ids"] = company_list
+output_file = "code_mapping_with_company_ids.xlsx"
 
-# Step 4: Save the result
-df.to_excel("code_mapping_with_company_ids.xlsx", index=False)
+# Fill down the code column and give each TBG row the company ids of its code
+# (python codemap.py at the repo root does every category in one run)
+fill_company_ids_file(input_file, output_file)
 
-print("✅ Done. File saved as 'code_mapping_with_company_ids.xlsx'")
+print(f"✅ Done. File saved as '{output_file}'")
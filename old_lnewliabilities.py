@@ -1,30 +1,8 @@
-import pandas as pd
-import re
+from reconcile import reconcile_files
 
-# Load the latest and old COA Excel files
-latest_df = pd.read_excel("full_Liability_COA.xlsx")
-old_df = pd.read_excel("liabilities_COA.xlsx")
-
-# --- Clean and extract 10-digit codes from latest COA ---
-# Convert all to string and extract 10-digit codes
-latest_df = latest_df.astype(str)
-latest_df["code"] = latest_df.iloc[:, 0].str.extract(r"(\b\d{10}\b)")
-latest_df["description"] = latest_df.iloc[:, 0].str.extract(r"\b\d{10}\b\s+(.*)")
-
-# Drop rows without valid code
-latest_df = latest_df.dropna(subset=["code"])
-
-# --- Clean codes from old COA ---
-old_df = old_df.dropna(subset=["code"])
-old_df["code"] = old_df["code"].astype(float).astype(int).astype(str).str.zfill(10)
-
-# --- Compare and find missing codes ---
-latest_codes = set(latest_df["code"])
-old_codes = set(old_df["code"])
-missing_codes = sorted(latest_codes - old_codes)
-
-# --- Filter the missing entries from latest_df ---
-missing_df = latest_df[latest_df["code"].isin(missing_codes)]
+# Latest COA codes that are missing from the old COA (liabilities_COA.xlsx), compared as 10-digit codes
+# (python reconcile.py checks both directions for every category)
+missing_df, _ = reconcile_files("full_Liability_COA.xlsx", "liabilities_COA.xlsx", "code", "code")
 
 # --- Export the result ---
 missing_df.to_excel("missing_liability_accounts.xlsx", index=False)
@@ -1,6 +1,10 @@
+import sys
 import pandas as pd
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))  # shared helpers at the repo root
+from ratestore import RateStore
+
 # ========================
 # Settings
 # ========================
@@ -10,6 +14,9 @@ SHEET = 0                                  # sheet index or name
 JOURNAL_NAME = "Open Vendor Invoices"
 DEFAULT_GL = "2060900000 Suspense account"   # <-- fixed account for all lines
 LABEL_TEMPLATE = "Payable to Vendor as on {date}-{docnum}"  # used if no Text column
+RATE_STORE = ""          # e.g. "../Rates/rate_store" (built by ratestore.py) to check bill-date rates
+DEFAULT_COMPANY = ""     # company code for the rate lookup when the input has no Company Code column
+RATES_CHECK_FILE = "Odoo_Vendor_Bills_rates.xlsx"  # rate per bill line; 1 in the company currency, blank = no rate on that date
 
 
 def normalize_cols(df: pd.DataFrame) -> dict:
@@ -39,6 +46,7 @@ def main():
     col_date = pick(cols, "posting date", "invoice/bill date", required=True)
     col_curr = pick(cols, "general ledger currency", "currency", required=True)
     col_text = pick(cols, "text", "invoice lines/label")  # optional
+    col_company = pick(cols, "company code", "company")  # optional, for the rate check
     col_amount = pick(
         cols,
         "amount in doc. curr.",
@@ -73,6 +81,17 @@ def main():
     # drop rows without essential values
     out = out.dropna(subset=["Reference", "Invoice/Bill Date"])
 
+    # --- optional: rate of each line's currency on its bill date, from the rate store ---
+    if RATE_STORE:
+        store = RateStore.load(RATE_STORE)
+        companies = src.loc[out.index, col_company].astype(str) if col_company else [DEFAULT_COMPANY] * len(out)
+        check = out[["Reference", "Invoice/Bill Date", "Currency"]].copy()
+        check["Company"] = list(companies)
+        check["Rate"] = store.rates(check["Currency"], check["Invoice/Bill Date"], check["Company"])
+        check.to_excel(RATES_CHECK_FILE, index=False)
+        missing = int(check["Rate"].isna().sum())
+        print(f"ℹ️ Rates checked: {missing} line(s) without a rate on the bill date, see '{RATES_CHECK_FILE}'")
+
     # sort so groups are together
     out = out.sort_values(
         ["Reference", "Invoice Partner Display Name", "Invoice/Bill Date"]
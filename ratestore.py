@@ -0,0 +1,203 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from xlcache import read_excel_cached
+
+# -------------------------------
+# Settings (python ratestore.py builds the store from a Rates/ output)
+# -------------------------------
+SOURCE_FILE = "Rates/odoo_rates_per_company.xlsx"
+STORE_PATH = "Rates/rate_store"  # writes rate_store.npy (the rates) and rate_store.json (the index)
+RATE_COL = "Rates/Inverse Company Rate"  # "Rates/Company Rate" for the consolidation files
+MAX_CARRY_DAYS = 7  # a series' last rate still answers this many days later (weekends, holidays), then NaN
+
+# Own currency of each company: lookups in it return 1.0 (the per-company rates only hold foreign currencies)
+COMPANY_CURRENCY = {
+    **dict.fromkeys(["IN10", "IN20", "IN30"], "INR"),
+    "TZ10": "TZS",
+    **dict.fromkeys(["KE10", "KE20", "KE30", "KE40", "KE50"], "KES"),
+    **dict.fromkeys(["UG10", "UG20"], "UGX"),
+    "ET10": "ETB",
+    "RW10": "RWF",
+    "GB10": "GBP",
+    "MW10": "MWK",
+    **dict.fromkeys(["AE00", "AE10", "AE20", "TBG"], "AED"),
+    "ZM10": "ZMW",
+    **dict.fromkeys(["MU10", "MU20", "MU30", "MU40", "MU50"], "MUR"),
+    **dict.fromkeys(["ZA10", "ZA20"], "ZAR"),
+    "US10": "USD",
+    "GH10": "GHS",
+    "CA10": "CAD",
+    "BR10": "BIF",
+    "NG10": "NGN",
+    "MZ10": "MZN",
+    "NA10": "NAD",
+    "SZ10": "SZL",
+    "SL10": "SLL",
+    "SA10": "SAR",
+}
+
+
+class RateStore:
+    """
+    Rates of each (company, currency) as one float array indexed by day offset from the first
+    rate date. Days without a rate (weekends, holidays) carry the previous rate forward, so a
+    lookup is a dict hit and an array index. Dates before a series' first rate give NaN; after
+    its last rate, that rate is carried for max_carry_days more days, then NaN (a series that
+    stopped being quoted does not answer for later dates). Gaps inside a series are carried
+    whatever their length. A company's own currency (company_currency) always gives 1.0.
+
+        store = RateStore.load("Rates/rate_store")       # memory-mapped, nothing read up front
+        store.rate("KES", "2025-07-14", company="KE10")
+        store.rates(df["Currency"], df["Posting Date"], df["Company Code"])   # vectorized
+
+    Files without a company column (consolidation rates) are stored under company "".
+    """
+
+    def __init__(self, matrix: np.ndarray, keys: list, start, last=None, company_currency=None,
+                 max_carry_days: int = MAX_CARRY_DAYS):
+        self.matrix = matrix  # one row per (company, currency), one column per day
+        self.keys = [tuple(k) for k in keys]
+        self.start = np.datetime64(start, "D")
+        # day offset of each series' last quoted rate (stores saved without it: the last day)
+        self.last = np.asarray(last if last is not None else [matrix.shape[1] - 1] * len(self.keys), dtype=np.int64)
+        self.company_currency = {str(k): str(v).strip().upper() for k, v in (company_currency or {}).items()}
+        self.max_carry_days = max_carry_days
+        self._row = {k: i for i, k in enumerate(self.keys)}
+        self._index = pd.MultiIndex.from_tuples(self.keys, names=["company", "currency"])
+
+    @property
+    def days(self) -> int:
+        return self.matrix.shape[1]
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, rate_col: str = RATE_COL, date_col: str = "Rates/Date",
+                   currency_col: str = "Rates/Currency", company_col: str = "Rates/Company",
+                   company_currency=None, max_carry_days: int = MAX_CARRY_DAYS):
+        rates = df[[date_col, rate_col, currency_col]].copy()
+        rates["company"] = df[company_col].astype(str) if company_col in df else ""
+        rates["day"] = pd.to_datetime(rates[date_col], errors="coerce")
+        rates = rates.dropna(subset=[rate_col, currency_col, "day"])
+        if rates.empty:
+            raise ValueError("No rates to store.")
+
+        codes, keys = pd.MultiIndex.from_arrays(
+            [rates["company"], rates[currency_col].astype(str).str.strip().str.upper()]
+        ).factorize()
+        day = rates["day"].to_numpy(dtype="datetime64[D]")
+        start = day.min()
+        offset = (day - start).astype(np.int64)
+
+        matrix = np.full((len(keys), offset.max() + 1), np.nan)
+        matrix[codes, offset] = rates[rate_col].to_numpy(dtype=float)
+        last = np.full(len(keys), -1, dtype=np.int64)
+        np.maximum.at(last, codes, offset)
+
+        # forward fill along days: index of the last filled day, carried with a running maximum
+        filled = np.where(np.isnan(matrix), 0, np.arange(matrix.shape[1]))
+        np.maximum.accumulate(filled, axis=1, out=filled)
+        matrix = matrix[np.arange(len(keys))[:, None], filled]
+        return cls(matrix, list(keys), start, last, company_currency, max_carry_days)
+
+    @classmethod
+    def from_excel(cls, path, **kwargs):
+        return cls.from_frame(read_excel_cached(path), **kwargs)
+
+    def save(self, path):
+        """Write <path>.npy (the rates) and <path>.json (keys, start date, last quotes, own currencies)."""
+        np.save(f"{path}.npy", np.ascontiguousarray(self.matrix))
+        meta = {
+            "start": str(self.start),
+            "keys": [list(k) for k in self.keys],
+            "last": self.last.tolist(),
+            "company_currency": self.company_currency,
+            "max_carry_days": self.max_carry_days,
+        }
+        tmp = f"{path}.json.tmp"
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, f"{path}.json")
+
+    @classmethod
+    def load(cls, path, mmap: bool = True):
+        """Open a saved store; with mmap the rates stay on disk and pages are read on lookup."""
+        with open(f"{path}.json", "r") as f:
+            meta = json.load(f)
+        matrix = np.load(f"{path}.npy", mmap_mode="r" if mmap else None)
+        return cls(
+            matrix, meta["keys"], meta["start"], meta.get("last"), meta.get("company_currency"),
+            meta.get("max_carry_days", MAX_CARRY_DAYS),
+        )
+
+    def rate(self, currency: str, date, company: str = "") -> float:
+        currency = currency.strip().upper()
+        if self.company_currency.get(company) == currency:
+            return 1.0
+        row = self._row.get((company, currency))
+        if row is None:
+            return float("nan")
+        day = int((np.datetime64(pd.Timestamp(date), "D") - self.start).astype(np.int64))
+        if day < 0 or day > self.last[row] + self.max_carry_days:
+            return float("nan")
+        return float(self.matrix[row, min(day, self.days - 1)])
+
+    def rates(self, currencies, dates, companies=None) -> np.ndarray:
+        """
+        rate() for whole columns at once; NaN where the pair or date is not covered, 1.0 in the
+        company's own currency.
+        Currencies, companies and text dates are resolved once per distinct value, not per line.
+        """
+        cur_codes, cur_uniques = pd.factorize(np.asarray(currencies, dtype=object))
+        if companies is None:
+            co_codes, co_uniques = np.zeros(len(cur_codes), dtype=np.intp), np.array([""], dtype=object)
+        else:
+            co_codes, co_uniques = pd.factorize(np.asarray(companies, dtype=object))
+
+        # row of every (company, currency) combination, -1 where the store has no such series
+        pairs = pd.MultiIndex.from_product([
+            pd.Index(co_uniques, dtype=object).astype(str),
+            pd.Index(cur_uniques, dtype=object).astype(str).str.strip().str.upper(),
+        ])
+        table = self._index.get_indexer(pairs)
+        own = (
+            pairs.get_level_values(0).map(self.company_currency).to_numpy(dtype=object)
+            == pairs.get_level_values(1).to_numpy(dtype=object)
+        )
+        known = (co_codes >= 0) & (cur_codes >= 0)
+        pair = np.where(known, co_codes * len(cur_uniques) + cur_codes, 0)
+        rows = np.where(known, table[pair], -1)
+
+        day = self._days(dates)
+        offset = (day - self.start).astype(np.int64)
+        ok = (rows >= 0) & ~np.isnat(day) & (offset >= 0)
+        ok[ok] = offset[ok] <= self.last[rows[ok]] + self.max_carry_days
+
+        out = np.full(len(rows), np.nan)
+        out[ok] = self.matrix[rows[ok], np.minimum(offset[ok], self.days - 1)]
+        out[known & own[pair]] = 1.0
+        return out
+
+    @staticmethod
+    def _days(dates) -> np.ndarray:
+        dates = pd.Series(dates) if not isinstance(dates, pd.Series) else dates
+        if pd.api.types.is_datetime64_any_dtype(dates):
+            return dates.to_numpy(dtype="datetime64[D]")
+        codes, uniques = pd.factorize(dates)
+        parsed = pd.to_datetime(pd.Series(uniques, dtype=object), errors="coerce").to_numpy(dtype="datetime64[D]")
+        return np.where(codes >= 0, parsed[codes], np.datetime64("NaT"))
+
+
+def main():
+    store = RateStore.from_excel(SOURCE_FILE, rate_col=RATE_COL, company_currency=COMPANY_CURRENCY)
+    store.save(STORE_PATH)
+    print(
+        f"✅ Rate store saved: '{STORE_PATH}.npy' ({len(store.keys)} company/currency series, "
+        f"{store.days} days from {store.start})"
+    )
+
+
+if __name__ == "__main__":
+    main()
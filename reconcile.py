@@ -0,0 +1,147 @@
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from coatext import CODE_LINE
+from xlcache import read_excel_cached
+from xlwriter import StreamingSheetWriter
+
+# -------------------------------
+# Settings (python reconcile.py checks every category in one run)
+# -------------------------------
+ROOT = Path(__file__).resolve().parent
+CATEGORIES = {  # paths relative to the repo root; code columns as named in each workbook
+    "Expense": {"coa": "Expense/Expense_coa.xlsx", "coa_code": "Code", "gl": "Expense/Expense_gl.xlsx", "gl_code": "Code"},
+    "Interco": {"coa": "Interco/Interco_coa.xlsx", "coa_code": "Code", "gl": "Interco/Interco_gl.xlsx", "gl_code": "Code"},
+    "income": {"coa": "income/icome_coa.xlsx", "coa_code": "Code", "gl": "income/income gl.xlsx", "gl_code": "Code"},
+    "Assets": {"coa": "Assets/Assets_COA.xlsx", "coa_code": "Code", "gl": "Assets/Assets_GL.xlsx", "gl_code": "Code"},
+    "Liabilities": {"coa": "full_Liability_COA.xlsx", "coa_code": "code", "gl": "liabilities_COA.xlsx", "gl_code": "code"},
+}
+OUTPUT_FILE = "coa_gl_reconciliation.xlsx"  # one sheet per category plus a Summary sheet
+WORKERS = 4  # categories reconciled side by side; 0 or 1 runs them one after the other
+
+NORMALIZED = "Normalized code"
+
+
+def normalize_codes(values) -> pd.Series:
+    """
+    Account codes as 10-digit text, whatever the workbook made of them: numbers (2010000000,
+    2.01e+09) are zero-padded, text is read as a COA line ("2010000000 Freehold land").
+    NaN where there is no code.
+    """
+    values = pd.Series(values)
+    out = pd.Series(np.nan, index=values.index, dtype=object)
+
+    numbers = pd.to_numeric(values.where(values.map(type).ne(str)), errors="coerce")
+    whole = numbers.notna() & numbers.eq(numbers.round())
+    out[whole] = numbers[whole].astype(np.int64).map("{:010d}".format)
+
+    text = values.map(type).eq(str)
+    if text.any():
+        out[text] = values[text].str.extract(CODE_LINE)["code"]
+    return out
+
+
+def load_side(path, code_col: str) -> pd.DataFrame:
+    """A COA or GL workbook with its codes normalized into a "Normalized code" column."""
+    df = read_excel_cached(path)
+    if code_col not in df.columns:
+        raise ValueError(f"Missing column '{code_col}' in '{path}'. Found: {list(df.columns)}")
+    df = df.copy()
+    df[NORMALIZED] = normalize_codes(df[code_col])
+    return df
+
+
+def compare(coa: pd.DataFrame, gl: pd.DataFrame):
+    """
+    Both directions of the code comparison with one hashed pass over the two code columns.
+    Returns (COA rows whose code is not in the GL, GL rows whose code is not in the COA);
+    rows without a code are left out of both.
+    """
+    codes, _ = pd.factorize(pd.concat([coa[NORMALIZED], gl[NORMALIZED]], ignore_index=True))
+    coa_codes, gl_codes = codes[: len(coa)], codes[len(coa):]
+    seen = np.zeros((2, codes.max(initial=-1) + 2), dtype=bool)  # column -1 collects rows without a code
+    seen[0, coa_codes] = True
+    seen[1, gl_codes] = True
+    missing_in_gl = coa[(coa_codes >= 0) & ~seen[1, coa_codes]]
+    missing_in_coa = gl[(gl_codes >= 0) & ~seen[0, gl_codes]]
+    return missing_in_gl, missing_in_coa
+
+
+def reconcile_files(coa_file, gl_file, coa_code: str = "Code", gl_code: str = "Code"):
+    """compare() straight from two workbooks."""
+    return compare(load_side(coa_file, coa_code), load_side(gl_file, gl_code))
+
+
+def _sheet_rows(df: pd.DataFrame, code_col: str, missing_in: str) -> pd.DataFrame:
+    other = [c for c in df.columns if c not in (code_col, NORMALIZED)]
+    return pd.DataFrame({
+        "Missing in": missing_in,
+        "Code": df[NORMALIZED].to_numpy(),
+        "Name": df[other[0]].to_numpy() if other else "",
+        "Source row": df.index.to_numpy() + 2,  # Excel row, below the header
+    }).sort_values("Code", kind="mergesort")
+
+
+def reconcile_category(job):
+    """Reconcile one category; returns (name, sheet rows, summary line)."""
+    name, spec, root = job
+    coa_path, gl_path = os.path.join(root, spec["coa"]), os.path.join(root, spec["gl"])
+    missing = [spec[side] for side, path in (("coa", coa_path), ("gl", gl_path)) if not os.path.exists(path)]
+    if missing:
+        return name, None, {"Category": name, "Note": f"skipped, '{missing[0]}' not found"}
+
+    coa = load_side(coa_path, spec["coa_code"])
+    gl = load_side(gl_path, spec["gl_code"])
+    missing_in_gl, missing_in_coa = compare(coa, gl)
+    sheet = pd.concat([
+        _sheet_rows(missing_in_gl, spec["coa_code"], "GL"),
+        _sheet_rows(missing_in_coa, spec["gl_code"], "COA"),
+    ], ignore_index=True)
+    summary = {
+        "Category": name,
+        "COA codes": int(coa[NORMALIZED].nunique()),
+        "GL codes": int(gl[NORMALIZED].nunique()),
+        "Missing in GL": len(missing_in_gl),
+        "Missing in COA": len(missing_in_coa),
+        "Rows without a code": int(coa[NORMALIZED].isna().sum() + gl[NORMALIZED].isna().sum()),
+        "Note": "",
+    }
+    return name, sheet, summary
+
+
+def run_categories(categories: dict, workers: int = WORKERS, root=ROOT) -> list:
+    jobs = [(name, spec, str(root)) for name, spec in categories.items()]
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            return list(pool.map(reconcile_category, jobs))
+    return [reconcile_category(job) for job in jobs]
+
+
+def main():
+    names = sys.argv[1:] or list(CATEGORIES)  # e.g. python reconcile.py Expense Assets
+    results = run_categories({n: CATEGORIES[n] for n in names})
+
+    summary = pd.DataFrame([s for _, _, s in results])
+    with StreamingSheetWriter(OUTPUT_FILE) as writer:
+        writer.add_sheet("Summary", summary.columns)
+        writer.write_frame(summary)
+        for name, sheet, _ in results:
+            if sheet is not None:
+                writer.add_sheet(name, sheet.columns)
+                writer.write_frame(sheet)
+
+    for _, _, s in results:
+        if s["Note"]:
+            print(f"⚠️ {s['Category']}: {s['Note']}")
+        else:
+            print(f"✅ {s['Category']}: {s['Missing in GL']} code(s) missing in GL, {s['Missing in COA']} missing in COA")
+    print(f"✅ Done. Saved '{OUTPUT_FILE}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# -------------------------------
+# Settings
+# -------------------------------
+CACHE_DIR_NAME = ".xlcache"   # created next to each source workbook
+INDEX_FILE = "index.json"
+MAX_AGE_DAYS = 30             # sidecars not used for this long are evicted
+
+
+def _file_digest(path: str) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _load_index(cache_dir: str) -> dict:
+    path = os.path.join(cache_dir, INDEX_FILE)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_index(cache_dir: str, index: dict):
+    path = os.path.join(cache_dir, INDEX_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(index, f, indent=1)
+    os.replace(tmp, path)
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _write_sidecar(df: pd.DataFrame, base: str) -> str:
+    """Parquet when the frame allows it; pickle for non-string headers or mixed-type columns."""
+    try:
+        path = base + ".parquet"
+        df.to_parquet(path + ".tmp", index=True)
+    except (ImportError, ValueError, TypeError):
+        _remove(base + ".parquet.tmp")
+        path = base + ".pkl"
+        df.to_pickle(path + ".tmp")
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def _read_sidecar(path: str, columns=None) -> pd.DataFrame:
+    if path.endswith(".pkl"):
+        df = pd.read_pickle(path)
+        return df if columns is None else df[columns]
+    df = pd.read_parquet(path, columns=columns)
+    # Parquet gives None for empty text cells where read_excel gives NaN
+    obj_cols = df.columns[df.dtypes == object]
+    if len(obj_cols):
+        df[obj_cols] = df[obj_cols].where(df[obj_cols].notna(), np.nan)
+    return df
+
+
+def read_excel_cached(path, cache_dir=None, columns=None, **kwargs) -> pd.DataFrame:
+    """
+    pd.read_excel with an on-disk sidecar.
+    The sidecar is reused while the workbook's size and mtime are unchanged; if they moved, the
+    content hash decides whether it is still valid. Different read_excel arguments get their own sidecar.
+    columns loads only those columns: the sidecar holds the whole sheet, so any selection of
+    columns shares it, and a parquet sidecar reads just the selected columns from disk.
+    """
+    src = os.path.abspath(path)
+    st = os.stat(src)
+    cache_dir = cache_dir or os.path.join(os.path.dirname(src), CACHE_DIR_NAME)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    key = hashlib.blake2b(
+        json.dumps([src, sorted(kwargs.items())], default=str).encode(), digest_size=8
+    ).hexdigest()
+    index = _load_index(cache_dir)
+    entry = index.get(key)
+    fresh = entry is not None and os.path.exists(entry["sidecar"])
+
+    if fresh and (entry["size"], entry["mtime_ns"]) != (st.st_size, st.st_mtime_ns):
+        digest = _file_digest(src)
+        fresh = entry["digest"] == digest
+        if fresh:
+            entry.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+
+    if fresh:
+        df = _read_sidecar(entry["sidecar"], columns)
+    else:
+        df = pd.read_excel(src, **kwargs)
+        if not isinstance(df, pd.DataFrame):
+            return df  # sheet_name=None / list -> dict of frames, not cached
+        if entry is not None:
+            _remove(entry["sidecar"])
+        digest = _file_digest(src)
+        base = os.path.join(cache_dir, f"{os.path.basename(src)}.{key}.{digest[:8]}")
+        entry = {
+            "source": src,
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "digest": digest,
+            "sidecar": _write_sidecar(df, base),
+        }
+        index[key] = entry
+        evict_stale_sidecars(cache_dir, index=index)
+        if columns is not None:
+            df = df[columns]
+
+    entry["used"] = time.time()
+    _save_index(cache_dir, index)
+    return df
+
+
+def evict_stale_sidecars(cache_dir: str, max_age_days: float = MAX_AGE_DAYS, index=None) -> list:
+    """
+    Remove sidecars whose source workbook is gone, that were not used for max_age_days,
+    or that no index entry points to any more. Returns the removed paths.
+    """
+    own_index = index is None
+    if own_index:
+        index = _load_index(cache_dir)
+
+    cutoff = time.time() - max_age_days * 86400
+    removed = []
+    for key, entry in list(index.items()):
+        if not os.path.exists(entry["source"]) or entry.get("used", time.time()) < cutoff:
+            _remove(entry["sidecar"])
+            removed.append(entry["sidecar"])
+            del index[key]
+
+    live = {os.path.basename(e["sidecar"]) for e in index.values()}
+    for name in os.listdir(cache_dir):
+        if name != INDEX_FILE and name not in live and not name.endswith(".tmp"):
+            _remove(os.path.join(cache_dir, name))
+            removed.append(os.path.join(cache_dir, name))
+
+    if own_index:
+        _save_index(cache_dir, index)
+    return removed
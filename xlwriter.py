@@ -0,0 +1,174 @@
+import csv
+import os
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+
+class StreamingSheetWriter:
+    """
+    Write Odoo import files row block by row block instead of through one big DataFrame.
+
+    .xlsx goes through a write-only openpyxl workbook (rows are flushed to disk as they are
+    appended); .csv is written with the csv module. Empty values (NaN, None, "") become empty cells.
+
+        with StreamingSheetWriter("odoo_journal_import.xlsx") as writer:
+            writer.add_sheet("Sheet1", columns)
+            for frame in frames:
+                writer.write_frame(frame)
+
+    A CSV holds one sheet; extra sheets go to "<name>_<sheet>.csv" next to it.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.is_csv = os.path.splitext(self.path)[1].lower() == ".csv"
+        self.rows_written = 0
+        self._wb = None if self.is_csv else Workbook(write_only=True)
+        self._ws = None
+        self._csv_file = None
+        self._csv = None
+        self._sheets = 0
+
+    def add_sheet(self, name: str, columns):
+        """Start a new sheet and write its header row."""
+        columns = list(columns)
+        if self.is_csv:
+            path = self.path
+            if self._sheets:
+                stem, ext = os.path.splitext(self.path)
+                path = f"{stem}_{name}{ext}"
+            if self._csv_file is not None:
+                self._csv_file.close()
+            self._csv_file = open(path, "w", newline="", encoding="utf-8")
+            self._csv = csv.writer(self._csv_file)
+            self._csv.writerow(columns)
+        else:
+            self._ws = self._wb.create_sheet(title=name[:31])
+            self._ws.append(columns)
+        self._sheets += 1
+
+    def write_frame(self, df: pd.DataFrame):
+        if self._sheets == 0:
+            self.add_sheet("Sheet1", df.columns)
+        if df.empty:
+            return
+        values = df.astype(object)
+        values = values.where(values.notna() & values.ne(""), None).to_numpy().tolist()
+        if self.is_csv:
+            self._csv.writerows([["" if v is None else v for v in row] for row in values])
+        else:
+            for row in values:
+                self._ws.append(row)
+        self.rows_written += len(values)
+
+    def write_rows(self, rows) -> int:
+        """Append rows (sequences of cell values, None = empty) to the current sheet; returns how many."""
+        n = 0
+        for row in rows:
+            if self.is_csv:
+                self._csv.writerow(["" if v is None else v for v in row])
+            else:
+                self._ws.append(row)
+            n += 1
+        self.rows_written += n
+        return n
+
+    def close(self):
+        if self.is_csv:
+            if self._csv_file is not None:
+                self._csv_file.close()
+        else:
+            if self._sheets == 0:
+                self._wb.create_sheet(title="Sheet1")
+            self._wb.save(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self._csv_file is not None:
+            self._csv_file.close()
+
+
+class ChunkedSheetWriter:
+    """
+    Spread rows over numbered files ("<name>_001.xlsx", "<name>_002.xlsx", ...) of at most
+    max_lines rows each, without ever splitting a group of rows across files.
+
+    write_frame takes a boolean array marking the first row of every group (e.g. the first
+    line of each journal entry); frames must start on a group boundary. A group larger than
+    max_lines gets a file of its own. chunks lists what went into each file, for the manifest.
+    """
+
+    def __init__(self, path, columns, max_lines: int, key_column=None):
+        self.stem, self.ext = os.path.splitext(str(path))
+        self.columns = list(columns)
+        self.max_lines = max_lines
+        self.key_column = key_column
+        self.chunks = []
+        self._writer = None
+
+    def _open_next(self):
+        self._close_current()
+        path = f"{self.stem}_{len(self.chunks) + 1:03d}{self.ext}"
+        self._writer = StreamingSheetWriter(path)
+        self._writer.add_sheet("Sheet1", self.columns)
+        self.chunks.append({"file": os.path.basename(path), "lines": 0, "groups": 0, "first": None, "last": None})
+
+    def _close_current(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def _write(self, df: pd.DataFrame, groups: int):
+        chunk = self.chunks[-1]
+        self._writer.write_frame(df)
+        chunk["lines"] += len(df)
+        chunk["groups"] += groups
+        if self.key_column is not None:
+            keys = df[self.key_column].astype(str)
+            if chunk["first"] is None:
+                chunk["first"] = keys.iloc[0]
+            named = keys[keys.ne("")]
+            if len(named):
+                chunk["last"] = named.iloc[-1]
+
+    def write_frame(self, df: pd.DataFrame, starts):
+        if df.empty:
+            return
+        starts = np.flatnonzero(np.asarray(starts, dtype=bool))
+        if len(starts) == 0 or starts[0] != 0:
+            raise ValueError("Frame does not start on a group boundary.")
+        ends = np.append(starts[1:], len(df))
+
+        run_start, run_groups = 0, 0
+        for s, e in zip(starts, ends):
+            if self._writer is None:
+                full = True
+            else:
+                # lines already in this file plus the run of groups not yet written
+                used = self.chunks[-1]["lines"] + (s - run_start)
+                full = used > 0 and used + (e - s) > self.max_lines
+            if full:
+                if run_groups:
+                    self._write(df.iloc[run_start:s], run_groups)
+                self._open_next()
+                run_start, run_groups = s, 0
+            run_groups += 1
+        self._write(df.iloc[run_start:], run_groups)
+
+    def close(self):
+        self._close_current()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self._writer is not None:
+            self._writer.__exit__(exc_type, exc, tb)